@@ -42,11 +42,26 @@ class docgenConfig:
         "email_from": "My Name <user@gmail.com>",            # Email From Address
         "email_subject": "Officials Development Report",        # Email Subject
         "email_body": "Attached is your Officials Development Report", # Email Body
+        "email_smtp_ssl": "True",                   # Connect with SSL (False for a plain local test server)
+        "email_connections": "4",                   # Simultaneous SMTP connections
+        "email_messages_per_connection": "100",     # Messages sent before reconnecting (0 = no limit)
+        "email_retries": "3",                       # Retries for a message that fails to send
+        "email_rate_limit": "0",                    # Maximum emails a minute (0 = no limit)
+        "email_max_attempts": "10",                 # Stop trying a recipient after this many attempts over all runs (0 = no limit)
         "incl_errors": "True",                      # Include Errors
         "incl_inv_pending": "True",                 # Include Invoice Pending Status
         "incl_pso_pending": "True",                 # Include PSO Pending Status
         "incl_account_pending": "True",             # Include Account Pending Status
         "incl_affiliates": "True",                  # Include Affiliated Officials
+        "report_workers": "0",                      # Report generation processes (0 = one per CPU, 1 = no parallelism)
+        "incremental_reports": "True",              # Only rebuild the reports that changed since the last run
+        "report_cache_size_mb": "256",              # Copy identical reports from a cache in cache_directory (0 = no caching)
+        "report_cache_include_date": "False",       # Only reuse a cached report produced on the same day
+        "cache_directory": "./docgen-cache",        # Parsed RTR export cache
+        "cache_size_mb": "256",                     # Parsed RTR export cache size (0 = no caching)
+        "perf_report": "False",                     # Write a performance report (JSON) to the report directory
+        "perf_profile": "False",                    # Also write a cProfile profile of each run
+        "perf_tracemalloc": "False",                # Also trace peak memory (slows the run down)
         "Theme": "System",                          # Theme- System, Dark or Light
         "Scaling": "100%",                          # Display Zoom Level
         "Colour" : "blue",                          # Colour Theme
@@ -62,6 +77,10 @@ class docgenConfig:
         with open(self._CONFIG_FILE, 'w') as configfile:
             self._config.write(configfile)
 
+    def has_option(self, name: str) -> bool:
+        '''True if name is a known option'''
+        return name in self._CONFIG_DEFAULTS[self._INI_HEADING]
+
     def get_str(self, name: str) -> str:
         '''Get a string option'''
         return self._config.get(self._INI_HEADING, name)
@@ -25,20 +25,28 @@
 import customtkinter as ctk
 import docgen_ui as ui
 from config import docgenConfig
-import docgen_version
 import os
 import sys
 import logging
-from requests.exceptions import RequestException
+import multiprocessing
+from threading import Thread
 
 from version import DOCGEN_VERSION
 
 
+# When GitHub was last asked for the latest release and its answer, so it is asked at most once a day
+UPDATE_CACHE_FILE = "docgen-update.json"
+
+
 def check_for_update() -> None:
     """Notifies if there's a newer released version"""
+    # pylint: disable=import-outside-toplevel
+    import docgen_version
+    from requests.exceptions import RequestException
+
     current_version = DOCGEN_VERSION
     try:
-        latest_version = docgen_version.latest()
+        latest_version = docgen_version.latest_cached(UPDATE_CACHE_FILE)
         if latest_version is not None and not docgen_version.is_latest_version(
             latest_version, current_version
         ):
@@ -51,9 +59,17 @@ def check_for_update() -> None:
         logging.warning("Error checking for update: %s", ex)
 
 
+def _warm_up() -> None:
+    '''Import the report and email modules (pandas, python-docx...) in the background so the first action doesn't wait'''
+    import docgen_core   # pylint: disable=import-outside-toplevel,unused-import
+
+
 def main():
     '''Runs the application'''
 
+    # Report generation uses worker processes, required for the frozen executable
+    multiprocessing.freeze_support()
+
     bundle_dir = getattr(sys, '_MEIPASS', os.path.abspath(os.path.dirname(__file__)))
 
     root = ctk.CTk()
@@ -73,7 +89,6 @@ def main():
     root.resizable(True, True)
     content = ui.docgenApp(root, config)
     content.grid(column=0, row=0, sticky="news")
-    check_for_update()
 
     try:
         root.update()
@@ -87,6 +102,10 @@ def main():
     except RuntimeError:
         pass
 
+    # The window is showing, load everything else and check for updates without holding up the UI
+    Thread(target=_warm_up, daemon=True).start()
+    Thread(target=check_for_update, daemon=True).start()
+
     root.mainloop()
 
     config.save()
@@ -0,0 +1,386 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+'''Performance benchmarks - run with "python docgen_bench.py <benchmark>"'''
+
+import argparse
+import io
+import os
+import random
+import socketserver
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from threading import Thread
+from typing import Dict, List, Optional
+
+import pandas as pd
+from docx.oxml import parse_xml
+
+from config import docgenConfig
+from docgen_core import Data_Loader, Email_Reports, Generate_Reports, docgenCore
+from docgen_docx import docgenMaster
+from docgen_rtr import CLINICS, OFFICIAL_COLUMNS, RTR_COLUMNS, clinic_date_columns, iter_officials, read_rtr_export
+
+# Allowed growth in the per-item cost between the smallest and largest run before a benchmark fails
+_LINEAR_TOLERANCE = 2.0
+
+
+def _sample_report(template) -> bytes:
+    '''Render a representative report and return its body'''
+    fields = {"report_date": "August 14 2023 09:00AM", "last_name": "Official", "first_name": "Sample",
+              "registration_id": "123456", "club_fullname": "Sample Swim Club", "club_code": "SAMPLE",
+              "certification_level": "LEVEL I - RED PIN"}
+    clinics = [("2023-01-01", "2023-02-01", "")] * len(docgenCore.CLINICS)
+    actions = ["Obtain 1 sign-off(s) for Introduction to Swimming Officiating",
+               "Take Judge of Stroke/Inspector of Turns Clinic"]
+    template.render(fields, clinics, actions)
+    return template.body_xml()
+
+
+def _check_linear(name: str, sizes: List[int], times: List[float]) -> bool:
+    '''Print the per-item cost for each size and check it stays flat'''
+    base = times[0] / sizes[0]
+    for size, elapsed in zip(sizes, times):
+        per_item = elapsed / size
+        print("%s %6d: %8.3fs total %8.1fus each (x%.2f)" % (name, size, elapsed, per_item * 1e6, per_item / base))
+    linear = times[-1] / sizes[-1] <= base * _LINEAR_TOLERANCE
+    print("%s: %s" % (name, "linear" if linear else "NOT LINEAR"))
+    return linear
+
+
+def bench_merge(sizes: List[int]) -> bool:
+    '''Master document merge time from 100 to 10,000 sections'''
+    template = docgenCore.new_template()
+    body_xml = _sample_report(template)
+
+    merge_times = []
+    save_times = []
+    for size in sizes:
+        bodies = [parse_xml(body_xml) for _ in range(size)]
+        master = docgenMaster(template)
+        start = time.perf_counter()
+        for body in bodies:
+            master.append(body)
+        merge_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        master.save(io.BytesIO())
+        save_times.append(time.perf_counter() - start)
+
+    merge_linear = _check_linear("merge", sizes, merge_times)
+    save_linear = _check_linear("save", sizes, save_times)
+    return merge_linear and save_linear
+
+
+def _sample_frame(rows: int) -> pd.DataFrame:
+    '''Officials frame with the columns used to produce the reports'''
+    data : Dict[str, List] = {column: ["%s %d" % (column, row) for row in range(rows)] for column in OFFICIAL_COLUMNS}
+    data["Recommendations"] = [["INTRO_CLINIC"]] * rows
+    for column in docgenCore.date_columns():
+        data[column] = ["2023-01-01"] * rows
+    return pd.DataFrame(data)
+
+
+def bench_records(sizes: List[int]) -> bool:
+    '''Per-row overhead of iterrows compared to the Official record iterator'''
+    date_columns = docgenCore.date_columns()
+    faster = True
+    for size in sizes:
+        df = _sample_frame(size)
+
+        start = time.perf_counter()
+        for _, entry in df.iterrows():
+            _ = (entry["Last Name"], entry["First Name"], entry["Recommendations"], [entry[column] for column in date_columns])
+        iterrows_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for official in iter_officials(df, date_columns):
+            _ = (official.last_name, official.first_name, official.recommendations, list(official.dates))
+        records_time = time.perf_counter() - start
+
+        print("records %6d: iterrows %8.1fus/row  iter_officials %8.1fus/row (x%.1f faster)" %
+              (size, iterrows_time / size * 1e6, records_time / size * 1e6, iterrows_time / records_time))
+        faster = faster and records_time < iterrows_time
+    return faster
+
+
+_STATUSES = [("Active", 80), ("Invoice Pending", 5), ("Account Pending", 5), ("PSO Pending", 5), ("Inactive", 5)]
+_LEVELS = [("", 40), ("LEVEL I - RED PIN", 35), ("LEVEL II - WHITE PIN", 15), ("LEVEL III - ORANGE PIN", 6),
+           ("LEVEL IV - GREEN PIN", 3), ("LEVEL V - BLUE PIN", 1)]
+
+
+def _pick(rng: random.Random, weighted: List) -> str:
+    return rng.choices([value for value, _ in weighted], [weight for _, weight in weighted])[0]
+
+
+def _date(rng: random.Random) -> str:
+    return "%d-%02d-%02d" % (rng.randint(2018, 2023), rng.randint(1, 12), rng.randint(1, 28))
+
+
+def write_synthetic_export(filename: str, officials: int, seed: int = 0) -> None:
+    '''Write a synthetic RTR export - an HTML table with the column names in the first row.
+
+    About 40 officials a club (10% also affiliated with another club), a realistic mix of status and
+    certification levels, and clinic flags and dates in the RTR's inconsistent forms (Yes/yes/no, blank
+    or 0001-01-01 for no date).  Unused columns pad it out to the width of a real export.
+    '''
+    rng = random.Random(seed)
+    clubs = max(1, officials // 40)
+    columns = RTR_COLUMNS + ["Unused %d" % extra for extra in range(40)]    # Real exports have ~150 columns
+    with open(filename, "w", encoding="utf-8") as export:
+        export.write("<html><body><table>\n<tr>%s</tr>\n" % "".join("<td>%s</td>" % column for column in columns))
+        for row in range(officials):
+            club = rng.randrange(clubs)
+            values = {
+                "Registration Id": str(100000 + row),
+                "Last Name": "Last%d" % row,
+                "First Name": "First%d" % row,
+                "Email": "official%d@example.com" % row,
+                "Status": _pick(rng, _STATUSES),
+                "ClubCode": "CLB%04d" % club,
+                "Club": "Swim Club %d" % club,
+                "AffiliatedClubs": "CLB%04d" % rng.randrange(clubs) if rng.random() < 0.1 else "",
+                "Current_CertificationLevel": _pick(rng, _LEVELS),
+            }
+            for clinic in CLINICS:
+                taken = rng.random() < 0.5
+                values[clinic] = rng.choice(["Yes", "yes"]) if taken else "no"
+                dates = clinic_date_columns(clinic)
+                values[dates[0]] = _date(rng) if taken else rng.choice(["", "0001-01-01"])
+                for evaluation in dates[1:]:
+                    values[evaluation] = _date(rng) if taken and rng.random() < 0.6 else rng.choice(["", "0001-01-01"])
+            export.write("<tr>%s</tr>\n" % "".join("<td>%s</td>" % values.get(column, "x") for column in columns))
+        export.write("</table></body></html>\n")
+
+
+def _measure(load, filename: str):
+    '''Time and peak memory to load the export'''
+    tracemalloc.start()
+    start = time.perf_counter()
+    load(filename)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def bench_load(sizes: List[int]) -> bool:
+    '''RTR export load time and peak memory, pd.read_html compared to read_rtr_export'''
+    faster = True
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            filename = os.path.join(directory, "export_%d.xls" % size)
+            write_synthetic_export(filename, size)
+            html_time, html_peak = _measure(lambda name: pd.read_html(name)[0], filename)
+            rtr_time, rtr_peak = _measure(read_rtr_export, filename)
+            print("load %6d (%5.1fMB): read_html %7.2fs %7.1fMB  read_rtr_export %7.2fs %7.1fMB (x%.1f faster)" %
+                  (size, os.path.getsize(filename) / 1e6, html_time, html_peak / 1e6, rtr_time, rtr_peak / 1e6,
+                   html_time / rtr_time))
+            faster = faster and rtr_time < html_time
+    return faster
+
+
+def bench_memory(sizes: List[int]) -> bool:
+    '''Size of the officials DataFrame, every column as text (pd.read_html) compared to read_rtr_export'''
+    smaller = True
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            filename = os.path.join(directory, "export_%d.xls" % size)
+            write_synthetic_export(filename, size)
+            text = pd.read_html(filename)[0]
+            text.columns = text.iloc[0]
+            text = text[1:]
+            text_bytes = text.memory_usage(deep=True).sum()
+            lean = read_rtr_export(filename)
+            lean_bytes = lean.memory_usage(deep=True).sum()
+            print("memory %6d: text %3d columns %7.1fMB  normalized %3d columns %7.1fMB (x%.1f smaller)" %
+                  (size, text.shape[1], text_bytes / 1e6, lean.shape[1], lean_bytes / 1e6, text_bytes / lean_bytes))
+            smaller = smaller and lean_bytes < text_bytes
+    return smaller
+
+
+class _StubSMTPHandler(socketserver.StreamRequestHandler):
+    '''Just enough SMTP to accept and discard messages from smtplib'''
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self):
+        self._reply("220 stub")
+        for line in self.rfile:
+            command = line[:4].upper()
+            if command == b"DATA":
+                self._reply("354 end with .")
+                for data in self.rfile:
+                    if data in (b".\r\n", b".\n"):
+                        break
+                self.server.messages += 1    # type: ignore
+                self._reply("250 accepted")
+            elif command == b"QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("250 ok")
+
+
+class _StubSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _StubSMTPHandler)
+        self.messages = 0
+
+
+def _pipeline_config(directory: str, export: str, port: int) -> docgenConfig:
+    '''The saved configuration with the files, caching and email server replaced for the benchmark'''
+    config = docgenConfig()
+    for name, value in [("officials_list", export), ("report_directory", directory), ("cache_size_mb", "0"),
+                        ("incremental_reports", "False"), ("perf_report", "False"), ("perf_profile", "False"),
+                        ("perf_tracemalloc", "False"), ("email_smtp_server", "127.0.0.1"), ("email_smtp_port", str(port)),
+                        ("email_smtp_ssl", "False"), ("email_smtp_user", ""), ("email_rate_limit", "0"), ("email_retries", "0")]:
+        config.set_str(name, value)
+    return config
+
+
+# Pipeline stages reported by the benchmark - (label, job, span)
+_STAGES = [("load", "load", "total"), ("rules", "generate", "rules"), ("filter", "generate", "filter"),
+           ("generate", "generate", "total"), ("compose", "generate", "master"), ("save", "generate", "master.save"),
+           ("email", "email", "total")]
+
+
+def bench_pipeline(sizes: List[int]) -> bool:
+    '''Load, filter, generate, compose and email (to a local stub server) stages on synthetic exports'''
+    server = _StubSMTPServer()
+    Thread(target=server.serve_forever, daemon=True).start()
+    stage_times : dict = {label: [] for label, _, _ in _STAGES}
+    try:
+        for size in sizes:
+            with tempfile.TemporaryDirectory() as directory:
+                export = os.path.join(directory, "export.xls")
+                write_synthetic_export(export, size)
+                config = _pipeline_config(directory, export, server.server_address[1])
+                spans = {}
+
+                loader = Data_Loader(config)
+                loader.run()
+                spans["load"] = loader.perf.spans
+                reports = Generate_Reports(loader.result, config)
+                reports.run()
+                spans["generate"] = reports.perf.spans
+                sent_before = server.messages
+                emails = Email_Reports(False, config)
+                emails.run()
+                spans["email"] = emails.perf.spans
+
+                line = []
+                for label, job, span in _STAGES:
+                    seconds = spans[job].get(span, {}).get("seconds", 0.0)
+                    stage_times[label].append(seconds)
+                    line.append("%s %7.2fs" % (label, seconds))
+                print("pipeline %6d (%d reports, %d emails): %s" %
+                      (size, reports.result or 0, server.messages - sent_before, "  ".join(line)))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    linear = True
+    for label in ["load", "generate", "email"]:
+        linear = _check_linear(label, sizes, stage_times[label]) and linear
+    return linear
+
+
+# Modules the GUI must not import before the window is showing (see docgen_ui._core)
+_LAZY_MODULES = ["docgen_core", "pandas", "numpy", "docx", "keyring", "slugify", "smtplib", "requests"]
+# Import time allowed for docgen_ui
+_STARTUP_BUDGET = 1.0
+
+
+def _import_times(module: str) -> dict:
+    '''Cumulative import time in seconds of every module imported by a fresh interpreter importing module'''
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                            capture_output=True, text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    times = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith("import time:") and "|" in line and "imported package" not in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def eager_modules(module: str, times: Optional[dict] = None) -> List[str]:
+    '''The modules in _LAZY_MODULES that importing module pulls in straight away
+
+    >>> eager_modules("docgen_ui")
+    []
+    '''
+    if times is None:
+        times = _import_times(module)
+    return [lazy for lazy in _LAZY_MODULES if lazy in times]
+
+
+def bench_startup(sizes: List[int]) -> bool:
+    '''Import time of the GUI before the window is shown, and that the heavy modules are left until later'''
+    runs = [_import_times("docgen_ui") for _ in range(sizes[0])]
+    startup = min(times["docgen_ui"] for times in runs)
+    eager = eager_modules("docgen_ui", runs[0])
+    core = min(_import_times("docgen_core")["docgen_core"] for _ in range(sizes[0]))
+    print("startup: docgen_ui %6.3fs (budget %.3fs)  docgen_core %6.3fs (deferred)" % (startup, _STARTUP_BUDGET, core))
+    if eager:
+        print("startup: imported before the window is shown: %s" % ", ".join(eager))
+    return not eager and startup <= _STARTUP_BUDGET
+
+
+_BENCHMARKS = {
+    "load": (bench_load, [1000, 10000]),
+    "memory": (bench_memory, [50000]),
+    "merge": (bench_merge, [100, 1000, 10000]),
+    "pipeline": (bench_pipeline, [100, 1000, 10000, 50000]),
+    "records": (bench_records, [1000, 10000]),
+    "startup": (bench_startup, [3]),
+}
+
+
+def main() -> int:
+    '''Run the selected benchmarks, returns non-zero if any of them failed'''
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("benchmarks", nargs="*", help="benchmarks to run: %s (default all)" % ", ".join(sorted(_BENCHMARKS)))
+    parser.add_argument("--sizes", type=int, nargs="+", help="override the problem sizes")
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in _BENCHMARKS:
+            parser.error("unknown benchmark: %s" % name)
+
+    ok = True
+    for name in args.benchmarks or sorted(_BENCHMARKS):
+        benchmark, sizes = _BENCHMARKS[name]
+        print("== %s: %s" % (name, benchmark.__doc__))
+        ok = benchmark(args.sizes or sizes) and ok
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' On-disk caches of parsed RTR exports and generated reports '''
+
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+from typing import Callable, Dict, Optional, Set, Tuple
+
+import pandas as pd
+
+
+class docgenCache:
+    '''Parsed RTR exports, stored as pickled DataFrames so reloading an unchanged export skips parsing.
+
+    Entries are named by the SHA-256 of the export.  The index maps each export path to its size,
+    modification time and hash, so the hash is only recomputed when the file has been touched.  A
+    touched file with the same content still hits.  The least recently used entries are removed
+    once the cache grows past max_bytes.
+    '''
+
+    # Bump when the parser output changes so stale entries are never used
+    VERSION = 2
+    _INDEX_FILE = "index.json"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._index_file = os.path.join(directory, self._INDEX_FILE)
+        # Hashes computed by this instance, so a miss followed by store() only hashes the export once
+        self._hashes : Dict[Tuple[str, int, int], str] = {}
+
+    def load(self, filename: str, reader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        '''Return the parsed export, using reader (and caching the result) if it isn't cached'''
+        df = self.cached(filename)
+        if df is None:
+            df = reader(filename)
+            self.store(filename, df)
+        return df
+
+    def cached(self, filename: str) -> Optional[pd.DataFrame]:
+        '''The parsed export if it is in the cache, otherwise None'''
+        path, index, entry = self._lookup(filename)
+        df = self._read_entry(self._cache_file(entry["sha256"]))
+        if df is not None:
+            logging.info("Loaded RTR data from cache")
+            self._update_index(index, path, entry)
+        return df
+
+    def store(self, filename: str, df: pd.DataFrame) -> None:
+        '''Cache the parsed export - the cache is only ever written by one process, the exports can be parsed anywhere'''
+        path, index, entry = self._lookup(filename)
+        self._write_entry(self._cache_file(entry["sha256"]), df)
+        self._update_index(index, path, entry)
+
+    def _lookup(self, filename: str) -> Tuple[str, Dict, Dict]:
+        '''The export's path, the cache index and the export's (possibly new) index entry'''
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        index = self._read_index()
+        entry = index.get(path)
+
+        if entry is None or entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            key = (path, stat.st_size, stat.st_mtime_ns)
+            if key not in self._hashes:
+                self._hashes[key] = self._hash(path)
+            entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": self._hashes[key]}
+        return path, index, entry
+
+    def _update_index(self, index: Dict, path: str, entry: Dict) -> None:
+        index[path] = entry
+        self._evict(index)
+        self._write_index(index)
+
+    def _cache_file(self, sha256: str) -> str:
+        return os.path.join(self._directory, "%s-v%d.pkl" % (sha256, self.VERSION))
+
+    @staticmethod
+    def _hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as export:
+            for block in iter(lambda: export.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _read_entry(cache_file: str):
+        '''The cached DataFrame or None (a missing or unreadable entry is a miss)'''
+        try:
+            with open(cache_file, "rb") as entry:
+                df = pickle.load(entry)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.info("Ignoring unreadable cache entry: {}".format(type(e).__name__))
+            return None
+        os.utime(cache_file)    # Mark as recently used for eviction
+        return df
+
+    def _write_entry(self, cache_file: str, df: pd.DataFrame) -> None:
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            temp_file = cache_file + ".tmp"
+            with open(temp_file, "wb") as entry:
+                pickle.dump(df, entry, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_file, cache_file)
+        except Exception as e:
+            logging.info("Unable to cache RTR data: {}".format(type(e).__name__))
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(self._index_file, "r", encoding="utf-8") as index:
+                return json.load(index)
+        except Exception:
+            return {}
+
+    def _write_index(self, index: Dict) -> None:
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            temp_file = self._index_file + ".tmp"
+            with open(temp_file, "w", encoding="utf-8") as index_file:
+                json.dump(index, index_file, indent=1)
+            os.replace(temp_file, self._index_file)
+        except Exception as e:
+            logging.info("Unable to save cache index: {}".format(type(e).__name__))
+
+    def _evict(self, index: Dict) -> None:
+        '''Remove the least recently used entries until the cache fits, and drop index entries without a file'''
+        try:
+            entries = [os.path.join(self._directory, name) for name in os.listdir(self._directory) if name.endswith(".pkl")]
+        except FileNotFoundError:
+            entries = []
+        entries.sort(key=os.path.getmtime, reverse=True)
+        total = 0
+        kept : Set[str] = set()
+        for cache_file in entries:
+            total += os.path.getsize(cache_file)
+            if total > self._max_bytes and kept:
+                os.remove(cache_file)
+            else:
+                kept.add(os.path.basename(cache_file))
+        for path in [path for path, entry in index.items() if os.path.basename(self._cache_file(entry["sha256"])) not in kept]:
+            del index[path]
+
+
+class docgenReportCache:
+    '''Generated reports, stored by the fingerprint of their content so an identical report is copied instead of rebuilt.
+
+    Reports are copied rather than hard linked, in both directions, because the reports in the report
+    directory are there to be customized and editing one must not change the cached copy.  Entries are
+    only ever written by renaming a finished file, so worker processes can share the cache.  Eviction of
+    the least recently used entries is left to the main process (see evict).
+    '''
+
+    def __init__(self, directory: str, max_bytes: int):
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    def _entry(self, key: str) -> str:
+        return os.path.join(self._directory, key + ".docx")
+
+    def fetch(self, key: str, filename: str) -> bool:
+        '''Copy the cached report to filename, False if there isn't one'''
+        entry = self._entry(key)
+        try:
+            shutil.copyfile(entry, filename)
+            os.utime(entry)     # Mark as recently used for eviction
+        except OSError:
+            return False
+        return True
+
+    def store(self, key: str, filename: str) -> None:
+        '''Add a copy of the report in filename to the cache'''
+        entry = self._entry(key)
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            temp_file = "%s.%d.tmp" % (entry, os.getpid())
+            shutil.copyfile(filename, temp_file)
+            os.replace(temp_file, entry)
+        except OSError as e:
+            logging.info("Unable to cache report: {}".format(type(e).__name__))
+
+    def evict(self) -> None:
+        '''Remove the least recently used reports until the cache fits'''
+        try:
+            entries = [os.path.join(self._directory, name) for name in os.listdir(self._directory) if name.endswith(".docx")]
+        except FileNotFoundError:
+            return
+        entries.sort(key=os.path.getmtime, reverse=True)
+        total = 0
+        for entry in entries:
+            total += os.path.getsize(entry)
+            if total > self._max_bytes:
+                os.remove(entry)
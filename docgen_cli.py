@@ -0,0 +1,135 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+'''Headless command line - load, generate and email without the GUI
+
+    python docgen_cli.py generate --officials-list export.xls --report-directory reports
+    python docgen_cli.py email --test
+
+Options come from docgen.ini, any of them can be overridden for the run with --set name=value.
+Nothing here imports tkinter so it runs on machines without a display.
+'''
+
+import argparse
+import logging
+import multiprocessing
+import sys
+from typing import List, Optional
+
+from config import docgenConfig
+from docgen_job import JobDone
+
+
+def _configure(args: argparse.Namespace) -> docgenConfig:
+    '''Load docgen.ini and apply the command line overrides (they are not saved)'''
+    config = docgenConfig()
+    overrides = list(args.set or [])
+    if args.officials_list:
+        overrides.append("officials_list=" + args.officials_list[0])
+    if args.report_directory:
+        overrides.append("report_directory=" + args.report_directory)
+    if args.workers is not None:
+        overrides.append("report_workers=%d" % args.workers)
+    for override in overrides:
+        name, _, value = override.partition("=")
+        if not config.has_option(name):
+            raise SystemExit("docgen: unknown option %s" % name)
+        config.set_str(name, value)
+    return config
+
+
+def _load(config: docgenConfig, args: argparse.Namespace):
+    '''Load the RTR export(s), None if nothing could be read'''
+    from docgen_core import Data_Loader   # pylint: disable=import-outside-toplevel
+
+    loader = Data_Loader(config, args.officials_list)
+    loader.run()
+    if loader.df.empty:
+        return None
+    return loader.df
+
+
+def _cmd_load(config: docgenConfig, args: argparse.Namespace) -> int:
+    return 0 if _load(config, args) is not None else 1
+
+
+def _run(job) -> JobDone:
+    '''Run a job on this thread and return how it ended'''
+    job.run()
+    while True:
+        event = job.events.get_nowait()
+        if isinstance(event, JobDone):
+            return event
+
+
+def _cmd_generate(config: docgenConfig, args: argparse.Namespace) -> int:
+    from docgen_core import Generate_Reports   # pylint: disable=import-outside-toplevel
+
+    df = _load(config, args)
+    if df is None:
+        return 1
+    job = Generate_Reports(df, config)
+    done = _run(job)
+    return 1 if done.error is not None or done.cancelled or job.failed else 0
+
+
+def _cmd_email(config: docgenConfig, args: argparse.Namespace) -> int:
+    from docgen_core import Email_Reports   # pylint: disable=import-outside-toplevel
+
+    job = Email_Reports(args.test, config)
+    done = _run(job)
+    if done.error is not None or done.cancelled or job.failed:
+        return 1
+    # Nothing sent is only a success if everything had been sent already
+    return 1 if not done.result and not job.skipped else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    '''Run a docgen command, returns the exit status'''
+    # Report generation uses worker processes, required for the frozen executable
+    multiprocessing.freeze_support()
+
+    # The options follow the command, e.g. "generate --workers 4"
+    options = argparse.ArgumentParser(add_help=False)
+    options.add_argument("--set", metavar="NAME=VALUE", action="append", help="override a docgen.ini option for this run")
+    options.add_argument("--officials-list", action="append", metavar="FILE",
+                         help="RTR export file, repeat to merge several")
+    options.add_argument("--report-directory", help="report output directory")
+    options.add_argument("--workers", type=int, help="report generation processes (0 = one per CPU)")
+
+    parser = argparse.ArgumentParser(prog="docgen", description="Swim Ontario - Officials Doc Generator (command line)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("load", parents=[options], help="read the RTR export (and fill the cache)").set_defaults(handler=_cmd_load)
+    commands.add_parser("generate", parents=[options],
+                        help="generate the reports, master document and email list").set_defaults(handler=_cmd_generate)
+    email = commands.add_parser("email", parents=[options], help="email the generated reports")
+    email.add_argument("--test", action="store_true", help="send at most 3 emails, all to email_from")
+    email.set_defaults(handler=_cmd_email)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    config = _configure(args)
+    return args.handler(config, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -24,233 +24,430 @@
 
 import pandas as pd
 from threading import Thread
-import tkinter as tk
-import numpy as np
+from queue import Queue
 import os
+import json
+import hashlib
+import time
 import keyring
 from slugify import slugify
 
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import deque
+from itertools import islice
+import multiprocessing
 from config import docgenConfig
-from docx import Document
-import docx
-from docxcompose.composer import Composer
+from docgen_cache import docgenCache, docgenReportCache
+from docgen_docx import docgenTemplate, docgenMaster
+from docgen_job import docgenJob
+from docgen_perf import docgenPerf
+from docgen_rules import ACTIONS, recommend
+import docgen_rtr as rtr
+from docgen_rtr import clinic_date_columns, iter_officials, merge_rtr_exports, normalize_officials, read_rtr_export
+from docgen_smtp import docgenSMTPPool, docgenRateLimiter, docgenSendJournal, docgenAttachmentCache
 
 import logging
 
-import smtplib, ssl
+import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
-from email import encoders
+from email.policy import SMTP
+from email.utils import make_msgid, parseaddr
 
 
 class docgenCore:
 
-    def __init__(self, club: str, club_data_set : pd.DataFrame, config: docgenConfig, **kwargs):
+    # Clinic table rows - report label and RTR clinic
+    CLINICS = [
+        ("Intro to Swimming", "Introduction to Swimming Officiating"),
+        ("Safety Marshal", "Safety Marshal"),
+        ("Stroke & Turn", "Judge of Stroke/Inspector of Turns"),
+        ("Chief Timekeeper", "Chief Timekeeper"),
+        ("Admin Desk (Clerk)", "Clerk of Course"),
+        ("Meet Manager", "Meet Manager"),
+        ("Starter", "Starter"),
+        ("CFJ/CJE", "Chief Finish Judge/Chief Judge"),
+        ("Chief Recorder/Recorder", "Recorder-Scorer"),
+        ("Referee", "Referee"),
+        ("Para eModule", "Para Swimming eModule"),
+    ]
+
+    # Format of the report date shown on each report
+    REPORT_DATE_FORMAT = "%B %d %Y %I:%M%p"
+
+    # Certification levels that don't get a report
+    EXCLUDED_LEVELS = ["LEVEL IV - GREEN PIN", "LEVEL V - BLUE PIN"]
+
+    def __init__(self, club: str, club_data_set : pd.DataFrame, config: docgenConfig, *,
+                 template: Optional[docgenTemplate] = None, previous: Optional[Dict[str, str]] = None,
+                 perf: Optional[docgenPerf] = None, reports: Optional[docgenReportCache] = None,
+                 filtered: bool = False):
         self._club_data_full = club_data_set
-        self._club_data = self._club_data_full.query("Current_CertificationLevel not in ['LEVEL IV - GREEN PIN','LEVEL V - BLUE PIN']")
+        # Generate_Reports drops the excluded levels for all clubs at once (filtered=True)
+        if filtered:
+            self._club_data = self._club_data_full
+        else:
+            self._club_data = self._club_data_full[~self._club_data_full["Current_CertificationLevel"].isin(self.EXCLUDED_LEVELS)]
+        # Generate_Reports evaluates the pathway rules for everyone up front, only do it here if it hasn't
+        if "Recommendations" not in self._club_data.columns:
+            self._club_data = self._club_data.assign(Recommendations=recommend(self._club_data))
         self.club_code = club
       
         self._config = config
+        self._template : docgenTemplate = template or self.new_template()
+        # Fingerprints of the reports from the previous run (see Generate_Reports) and of the ones from this run
+        self._previous : Dict[str, str] = previous or {}
+        self.fingerprints : Dict[str, str] = {}
+        self.unchanged = 0
+        # Reports that couldn't be produced
+        self.failed = 0
+        self._perf : docgenPerf = perf or docgenPerf("report")
+        # Reports from any earlier run, by content (see Generate_Reports)
+        self._reports : Optional[docgenReportCache] = reports
+        self._cache_with_date = config.get_bool("report_cache_include_date")
+
+    @classmethod
+    def new_template(cls) -> docgenTemplate:
+        '''Build the report skeleton - share one across clubs to avoid rebuilding it'''
+        return docgenTemplate([clinic[0] for clinic in cls.CLINICS])
 
-
-    def _is_valid_date(self, date_string) -> bool:
-        if pd.isnull(date_string): return False
-        if date_string == "0001-01-01": return False 
-        try:
-            datetime.strptime(date_string, '%Y-%m-%d')
-            return True
-        except ValueError:
-            return False
-    
     def _get_date(self, date_string) -> str: 
         if pd.isnull(date_string): return ""
         if date_string == "0001-01-01": return "" 
         return date_string
-  
-    def _count_signoffs(self, clinic_date_1, clinic_date_2) -> int:
-        count = 0
-        if self._is_valid_date(clinic_date_1): count += 1
-        if self._is_valid_date(clinic_date_2): count += 1
-        return count
     
-    def add_clinic(self, table, clinic_name, clinic_date, signoff_1, signoff_2) -> None:
-        row = table.add_row().cells
-        row[0].text = clinic_name
-        row[1].text = self._get_date(clinic_date)
-        row[2].text = self._get_date(signoff_1)
-        row[3].text = self._get_date(signoff_2)
-        row[0].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.LEFT
-        row[1].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
-        row[2].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
-        row[3].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
-  
-    def dump_data_docx(self, club_fullname: str, reportdate: str) -> List:
-        '''Produce the Word Document for the club and return a list of files'''
+    @classmethod
+    def date_columns(cls) -> List[str]:
+        '''RTR date columns shown in the clinic table, in table order'''
+        return [column for _, clinic in cls.CLINICS for column in clinic_date_columns(clinic)]
+
+    def _clinic_dates(self, dates: Tuple) -> List[Tuple[str, str, str]]:
+        '''Clinic date and sign-off dates for each row of the clinic table'''
+        table = []
+        next_date = iter(dates)
+        for _, clinic in self.CLINICS:
+            clinic_date = self._get_date(next(next_date))
+            if rtr.CLINICS[clinic]:
+                table.append((clinic_date, self._get_date(next(next_date)), self._get_date(next(next_date))))
+            else:
+                table.append((clinic_date, "N/A", "N/A"))
+        return table
+
+    def dump_data_docx(self, club_fullname: str, reportdate: str, master: Optional[docgenMaster] = None,
+                       bodies: Optional[List] = None, outbox: Optional[Queue] = None) -> List:
+        '''Produce the Word Document for the club and return a list of files
+
+        Each report is also appended to the master document, or its body collected in bodies
+        when running in a worker process.  With an outbox the documents aren't saved, instead each one
+        is put on the outbox for Email_Reports as (last name, first name, email, filename, content).
+        '''
  
         _report_directory = self._config.get_str("report_directory")
         _email_list_csv = self._config.get_str("email_list_csv")
         csv_list = []    # CSV entries for email list (Lastname, Firstname, E-Mail address and Filename)
  
-        for index, entry in self._club_data.iterrows():
+        for official in iter_officials(self._club_data, self.date_columns()):
 
             # create a filename from the last and firstnames using slugify and the report directory
 
-            filename = os.path.abspath(os.path.join(_report_directory, slugify(entry["Last Name"] + "_" + entry["First Name"]) + ".docx"))
-            csv_list.append([entry["Last Name"], entry["First Name"], entry["Email"], filename])
-
-            doc = Document()
+            filename = os.path.abspath(os.path.join(_report_directory, slugify(official.last_name + "_" + official.first_name) + ".docx"))
+            csv_list.append([official.last_name, official.first_name, official.email, filename])
+
+            fields = {
+                "report_date": reportdate,
+                "last_name": official.last_name,
+                "first_name": official.first_name,
+                "registration_id": official.registration_id,
+                "club_fullname": club_fullname,
+                "club_code": self.club_code,
+                "certification_level": "NONE" if pd.isnull(official.certification_level) else official.certification_level,
+            }
+            clinics = self._clinic_dates(official.dates)
+
+            actions = [ACTIONS[code] for code in official.recommendations]
+
+            if outbox is not None:
+                try:
+                    with self._perf.span("render"):
+                        self._template.render(fields, clinics, actions)
+                    with self._perf.span("save"):
+                        content = self._template.to_bytes()
+                    outbox.put((official.last_name, official.first_name, official.email, filename, content))
+                except Exception as e:
+                    logging.info(f'Error processing offiical {official.last_name}, {official.first_name}: {type(e).__name__} - {e}')
+                    self.failed += 1
+                continue
+
+            fingerprint = self._template.fingerprint(fields, clinics, actions)
+            cache_key = self._cache_key(fingerprint, reportdate)
+            if (not self._reuse_report(filename, fingerprint, fields, clinics, actions) and
+                    not self._cached_report(filename, fingerprint, cache_key)):
+                try:
+                    with self._perf.span("render"):
+                        self._template.render(fields, clinics, actions)
+                    with self._perf.span("save"):
+                        self._template.save(filename)
+                    self.fingerprints[filename] = fingerprint
+                    if self._reports is not None:
+                        with self._perf.span("cache.store"):
+                            self._reports.store(cache_key, filename)
+
+                except Exception as e:
+                    logging.info(f'Error processing offiical {official.last_name}, {official.first_name}: {type(e).__name__} - {e}')
+                    self.failed += 1
+
+            if bodies is not None:
+                bodies.append(self._template.body_xml())
+            if master is not None:
+                with self._perf.span("master"):
+                    self._template.append_to(master)
 
-            doc.add_heading("2023/24 Officials Development", 0)
- 
-            p = doc.add_paragraph()
-            p.add_run("Report Date: "+reportdate)
-            p.add_run("\n\nName: "+ entry["Last Name"] + ", " + entry["First Name"] + " (SNC ID # " + entry["Registration Id"] + ")")
-            p.add_run("\n\nClub: "+ club_fullname + " (" + self.club_code + ")")
-            p.add_run("\n\nCurrent Certification Level: ")
-            p.add_run("NONE" if pd.isnull(entry["Current_CertificationLevel"]) else entry["Current_CertificationLevel"])
-
-
-
-            table = doc.add_table(rows=1, cols=4)
-            row = table.rows[0].cells
-            row[0].text = "Clinic"
-            row[1].text = "Clinic Date"
-            row[2].text = "Sign Off #1"
-            row[3].text = "Sign Off #2" 
-            row[0].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.LEFT
-            row[1].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
-            row[2].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
-            row[3].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
-
-
-            self.add_clinic(table, "Intro to Swimming", entry["Introduction to Swimming Officiating-ClinicDate"], entry["Introduction to Swimming Officiating-Deck Evaluation #1 Date"], entry["Introduction to Swimming Officiating-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "Safety Marshal", entry["Safety Marshal-ClinicDate"], "N/A", "N/A")
-            self.add_clinic(table, "Stroke & Turn", entry["Judge of Stroke/Inspector of Turns-ClinicDate"], entry["Judge of Stroke/Inspector of Turns-Deck Evaluation #1 Date"], entry["Judge of Stroke/Inspector of Turns-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "Chief Timekeeper", entry["Chief Timekeeper-ClinicDate"], entry["Chief Timekeeper-Deck Evaluation #1 Date"], entry["Chief Timekeeper-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "Admin Desk (Clerk)", entry["Clerk of Course-ClinicDate"], entry["Clerk of Course-Deck Evaluation #1 Date"], entry["Clerk of Course-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "Meet Manager", entry["Meet Manager-ClinicDate"], entry["Meet Manager-Deck Evaluation #1 Date"], entry["Meet Manager-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "Starter", entry["Starter-ClinicDate"], entry["Starter-Deck Evaluation #1 Date"], entry["Starter-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "CFJ/CJE", entry["Chief Finish Judge/Chief Judge-ClinicDate"], entry["Chief Finish Judge/Chief Judge-Deck Evaluation #1 Date"], entry["Chief Finish Judge/Chief Judge-Deck Evaluation #2 Date"])
-            self.add_clinic(table, "Chief Recorder/Recorder", entry["Recorder-Scorer-ClinicDate"], "N/A", "N/A")
-            self.add_clinic(table, "Referee", entry["Referee-ClinicDate"], "N/A", "N/A")
-            self.add_clinic(table, "Para eModule", entry["Para Swimming eModule-ClinicDate"], "N/A", "N/A")
-            
-            table.style = "Light Grid Accent 5"
-            table.autofit = True
-
-            # Add logic to define pathway progression
-
-            doc.add_heading("Recommended Actions", 2)
-
-            # For NoLevel officials, add a section to identify what they need to do to get to Level I
-
-            if pd.isnull(entry["Current_CertificationLevel"]):
-                if entry["Introduction to Swimming Officiating"].lower() == "no":
-                    doc.add_paragraph("Take Introduction to Swimming Officiating Clinic and obtain sign-offs", style="List Bullet")
-                else:
-                    # if < 2 clinics tell user to get remaining sign-offs (2 - # of clinics)
-                    num_signoffs = self._count_signoffs(entry["Introduction to Swimming Officiating-Deck Evaluation #1 Date"],entry["Introduction to Swimming Officiating-Deck Evaluation #2 Date"])
-                    if num_signoffs < 2:
-                        doc.add_paragraph(f"Obtain {2-num_signoffs} sign-off(s) for Introduction to Swimming Officiating", style="List Bullet")
-                   
-                if entry["Safety Marshal"].lower() == "no":
-                        doc.add_paragraph("Take Safety Marshal Clinc", style="List Bullet")
-
-            # For Level I officials - check if they have stroke & turn and have completed 2 sign-offs
-
-            if entry["Current_CertificationLevel"] == "LEVEL I - RED PIN":
-                intro_signoffs = self._count_signoffs(entry["Introduction to Swimming Officiating-Deck Evaluation #1 Date"],entry["Introduction to Swimming Officiating-Deck Evaluation #2 Date"])
-                if intro_signoffs < 2:
-                    doc.add_paragraph(f"Obtain {2-intro_signoffs} sign-off(s) for Introduction to Swimming Officiating", style="List Bullet")
-
-                if entry["Judge of Stroke/Inspector of Turns"].lower() == "no":
-                    doc.add_paragraph("Take Judge of Stroke/Inspector of Turns Clinic", style="List Bullet")
-                else:
-                    num_signoffs = self._count_signoffs(entry["Judge of Stroke/Inspector of Turns-Deck Evaluation #1 Date"],entry["Judge of Stroke/Inspector of Turns-Deck Evaluation #2 Date"])
-                    if num_signoffs < 2:
-                        doc.add_paragraph(f"Obtain {2-num_signoffs} sign-off(s) for Judge of Stroke/Inspector of Turns", style="List Bullet")
-                    # At this point we know they have stroke & turn and intro.  Determine Level II recommendations.
-                    if intro_signoffs + num_signoffs >= 3:   # They have completed or nearly completed "core" requirements
-                        # Check if they have any other clinics
-                        if entry["Chief Timekeeper"].lower() == "no" and entry["Clerk of Course"].lower() == "no" and entry["Meet Manager"].lower() == "no" and entry["Starter"].lower() == "no" and entry["Chief Finish Judge/Chief Judge"].lower() == "no": 
-                            doc.add_paragraph("Take a Level II clinic (CT, MM, CFJ/CJE, Admin Desk or Starter) and obtain sign-offs", style="List Bullet")
-                        else:
-                            doc.add_paragraph("Obtain sign-offs on at least 1 Level II clinic (CT, MM, CFJ/CJE, Admin Desk or Starter)", style="List Bullet")
-            try:
-                doc.save(filename)
+        return csv_list
 
-            except Exception as e:
-                logging.info(f'Error processing offiical {entry["Last Name"]}, {entry["First Name"]}: {type(e).__name__} - {e}')
+    def _reuse_report(self, filename: str, fingerprint: str, fields: Dict[str, str], clinics: List[Tuple[str, str, str]],
+                      actions: List[str]) -> bool:
+        '''Load the report saved by a previous run if nothing in it has changed
 
-        return csv_list
+        A report that has been customized with pictures, links etc. is left as it is, and the master
+        document gets a freshly rendered copy instead.
+        '''
+        if self._previous.get(filename) != fingerprint or not os.path.exists(filename):
+            return False
+        try:
+            with self._perf.span("reuse"):
+                if not self._template.load_file(filename):
+                    logging.info("%s has been customized, it is not changed but the master document has the generated report" %
+                                 os.path.basename(filename))
+                    with self._perf.span("render"):
+                        self._template.render(fields, clinics, actions)
+        except Exception:
+            return False
+        self.fingerprints[filename] = fingerprint
+        self.unchanged += 1
+        return True
+
+    def _cache_key(self, fingerprint: str, reportdate: str) -> str:
+        '''Report cache entry - the fingerprint leaves out the report date, add it if cached reports must match it'''
+        if self._cache_with_date:
+            # reportdate includes the time of the run, only the day it was produced matters
+            try:
+                day = datetime.strptime(reportdate, self.REPORT_DATE_FORMAT).date().isoformat()
+            except ValueError:
+                day = reportdate
+            return hashlib.sha256((fingerprint + day).encode("utf-8")).hexdigest()
+        return fingerprint
+
+    def _cached_report(self, filename: str, fingerprint: str, cache_key: str) -> bool:
+        '''Copy an identical report from the report cache instead of rebuilding it'''
+        if self._reports is None:
+            return False
+        try:
+            with self._perf.span("cache.fetch"):
+                if not self._reports.fetch(cache_key, filename) or not self._template.load_file(filename):
+                    return False
+        except Exception:
+            return False
+        self.fingerprints[filename] = fingerprint
+        self.unchanged += 1
+        return True
 
-class TextHandler(logging.Handler):
-    # This class allows you to log to a Tkinter Text or ScrolledText widget
-    # Adapted from Moshe Kaplan: https://gist.github.com/moshekaplan/c425f861de7bbf28ef06
+class _Worker_Log_Handler(logging.Handler):
+    '''Collect log messages inside a report worker process so they can be replayed by the main process'''
 
-    def __init__(self, text):
-        # run the regular Handler __init__
+    def __init__(self):
         logging.Handler.__init__(self)
-        # Store a reference to the Text it will log to
-        self.text = text
+        self.messages = []
 
     def emit(self, record):
-        msg = self.format(record)
-        def append():
-            self.text.configure(state='normal')
-            self.text.insert(tk.END, msg + '\n')
-            self.text.configure(state='disabled')
-            # Autoscroll to the bottom
-            self.text.yview(tk.END)
-        # This is necessary because we can't modify the Text from other threads
-        self.text.after(0, append)
-
-class Data_Loader(Thread):
-    '''Load Data files'''
-    def __init__(self, config: docgenConfig):
+        self.messages.append(self.format(record))
+
+_worker_log_handler : _Worker_Log_Handler
+_worker_template : docgenTemplate
+_worker_previous : Dict[str, str]
+_worker_reports : Optional[docgenReportCache]
+
+
+def _init_report_worker(previous: Dict[str, str], reports: Optional[docgenReportCache]) -> None:
+    '''Process pool initializer - capture logging in the worker and build its report skeleton'''
+    global _worker_log_handler, _worker_template, _worker_previous, _worker_reports
+    _worker_template = docgenCore.new_template()
+    _worker_previous = previous
+    _worker_reports = reports
+    _worker_log_handler = _Worker_Log_Handler()
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    logger.addHandler(_worker_log_handler)
+
+
+def _generate_batch(club: str, club_fullname: str, club_data: pd.DataFrame, config: docgenConfig, reportdate: str):
+    '''Process pool task - produce the documents for a batch of officials from one club'''
+    bodies : List = []
+    perf = docgenPerf("batch")
+    club_stat = docgenCore(club, club_data, config, template=_worker_template, previous=_worker_previous, perf=perf, filtered=True,
+                           reports=_worker_reports)
+    csv_list = club_stat.dump_data_docx(club_fullname, reportdate, bodies=bodies)
+    messages = _worker_log_handler.messages
+    _worker_log_handler.messages = []
+    return csv_list, bodies, messages, club_stat.fingerprints, club_stat.unchanged, club_stat.failed, perf.spans
+
+
+def _read_export(html_file: str) -> pd.DataFrame:
+    '''Read one RTR export, falling back to the generic HTML reader if the streaming parser can't read it'''
+    try:
+        return read_rtr_export(html_file)
+    except Exception as e:
+        logging.info("Unable to read RTR export directly ({}), trying generic HTML reader".format(type(e).__name__))
+
+    df = pd.read_html(html_file)[0]
+    df.columns = df.iloc[0]   # The first row is the column names
+    df = df[1:]
+
+    # Club Level exports include blank rows, 0001-01-01 dates and Yes/yes flags - normalize deals with all of them
+    return normalize_officials(df)
+
+
+class Data_Loader(docgenJob):
+    '''Load Data files - the result is the officials DataFrame (empty if it couldn't be loaded)
+
+    Several exports (e.g. one per club) are parsed in parallel worker processes and merged once, with
+    the record from the most recently modified export winning for officials that appear in more than one.
+    '''
+    def __init__(self, config: docgenConfig, files: Optional[List[str]] = None):
         super().__init__()
         self._config = config
+        self._files = files if files else [config.get_str("officials_list")]
         self.df : pd.DataFrame 
         self.affiliates : pd.DataFrame 
+        self.perf = docgenPerf.from_config("load", config)
 
-    def run(self):
-        html_file = self._config.get_str("officials_list")
+    def _cache(self) -> Optional[docgenCache]:
+        cache_size = self._config.get_int("cache_size_mb")
+        if cache_size <= 0:
+            return None
+        return docgenCache(self._config.get_str("cache_directory"), cache_size * 1024 * 1024)
+
+    def execute(self) -> pd.DataFrame:
         self.club_list_names_df = pd.DataFrame
-        self.club_list_names = []
+        self.club_list_names : List = []
         logging.info("Loading RTR Data")
         try:
-            self.df = pd.read_html(html_file)[0]
-        except:
+            with self.perf.span("parse"):
+                if len(self._files) > 1:
+                    self.df = self._load_many()
+                else:
+                    cache = self._cache()
+                    self.df = cache.load(self._files[0], _read_export) if cache else _read_export(self._files[0])
+        except Exception:
             logging.info("Unable to load data file")
-            self.df = pd.DataFrame
-            self.affiliates = pd.DataFrame
-            return
-        self.df.columns = self.df.iloc[0]   # The first row is the column names
-        self.df = self.df[1:]
-
-        # Club Level exports include blank rows, purge those out
-        self.df.drop(index=self.df[self.df['Registration Id'].isnull()].index, inplace=True)
-
-        # The RTR has 2 types of "empty" dates.  One is blank the other is 0001-01-01.  Fix that.
-        self.df.replace('0001-01-01', np.nan, inplace=True)
-
-        # The RTR export is inconsistent on column values for certifications. Fix that.
-        self.df.replace('Yes','yes', inplace=True)    # We don't use the no value so no need to fix it 
+            self.df = pd.DataFrame()
+            self.affiliates = pd.DataFrame()
+            return self.df
 
+        self.perf.count("officials", self.df.shape[0])
         logging.info("Loaded %d officials" % self.df.shape[0])
-
         logging.info("Loading Complete")
-
-class Generate_Reports(Thread):
-    def __init__(self, df: pd.DataFrame, config: docgenConfig):
+        return self.df
+
+    def _load_many(self) -> pd.DataFrame:
+        '''Parse the exports that aren't cached in worker processes and merge them all'''
+        cache = self._cache()
+        frames : Dict[str, pd.DataFrame] = {}
+        to_parse = []
+        for html_file in self._files:
+            try:
+                df = cache.cached(html_file) if cache else None
+            except Exception as e:
+                # Missing or unreadable, skipped like an export that can't be parsed
+                logging.info("Unable to load %s: %s" % (os.path.basename(html_file), type(e).__name__))
+                continue
+            if df is None:
+                to_parse.append(html_file)
+            else:
+                frames[html_file] = df
+        self.progress(len(frames), len(self._files))
+
+        if to_parse:
+            workers = self._config.get_int("report_workers")
+            if workers <= 0:
+                workers = os.cpu_count() or 1
+            workers = min(workers, len(to_parse))
+            logging.info("Reading %d RTR exports using %d processes" % (len(to_parse), workers))
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = {pool.submit(_read_export, html_file): html_file for html_file in to_parse}
+                for future in as_completed(futures):
+                    html_file = futures[future]
+                    try:
+                        frames[html_file] = future.result()
+                    except Exception as e:
+                        logging.info("Unable to load %s: %s" % (os.path.basename(html_file), type(e).__name__))
+                        continue
+                    if cache:
+                        try:
+                            cache.store(html_file, frames[html_file])
+                        except Exception as e:
+                            # The export was read, it just won't be cached for next time
+                            logging.info("Unable to cache %s: %s" % (os.path.basename(html_file), type(e).__name__))
+                    self.progress(len(frames), len(self._files))
+                    if self.cancelled:
+                        pool.shutdown(cancel_futures=True)
+                        break
+
+        if not frames:
+            raise ValueError("None of the RTR exports could be read")
+        # Oldest first, so the latest record for each official wins
+        ordered = sorted(frames, key=lambda html_file: os.stat(html_file).st_mtime if os.path.exists(html_file) else 0)
+        with self.perf.span("merge"):
+            df = merge_rtr_exports([frames[html_file] for html_file in ordered])
+        logging.info("Merged %d RTR exports" % len(frames))
+        return df
+
+class Generate_Reports(docgenJob):
+    '''Produce the reports, master document and email list - the result is the number of reports'''
+    # Number of officials handed to a worker process at a time.  Small enough to spread a single
+    # large club across all of the workers, large enough that the pickling overhead stays low.
+    _BATCH_SIZE = 25
+    # Fingerprint of each report, kept in the report directory so a rerun only rebuilds the reports that changed
+    _MANIFEST_FILE = "docgen-manifest.json"
+    # Reports by content, kept under cache_directory (shared by every report directory) so identical
+    # reports are copied rather than rebuilt
+    _REPORT_CACHE_DIRECTORY = "reports"
+
+    def __init__(self, df: pd.DataFrame, config: docgenConfig, outbox: Optional[Queue] = None):
         super().__init__()
         self._df : pd.DataFrame = df
         self._config : docgenConfig = config
+        # Generate and send - hand the documents to Email_Reports instead of saving them
+        self._outbox = outbox
+        self.perf = docgenPerf.from_config("generate", config)
+        # Reports (and the email list or master document) that couldn't be saved
+        self.failed = 0
+
+    def _club_data_sets(self, club_list_names: List, status_values: List) -> List[Tuple[str, str, pd.DataFrame]]:
+        '''The officials to report on for each club
+
+        The status and certification level filters are applied once and the officials split by club in a
+        single groupby pass, rather than scanning the whole frame for every club.
+        '''
+        df = self._df
+        df = df[df["Status"].isin(status_values) & ~df["Current_CertificationLevel"].isin(docgenCore.EXCLUDED_LEVELS)]
+        positions = df.groupby("ClubCode", observed=True, sort=False).indices
+        no_officials = df.iloc[0:0]
+        return [(club, club_full, df.iloc[positions[club]] if club in positions else no_officials)
+                for club, club_full in club_list_names]
+
+    def execute(self) -> int:
+        if self._outbox is None:
+            return self._generate()
+        # Email_Reports waits for the end of the documents however generation ends
+        try:
+            return self._generate()
+        finally:
+            self._outbox.put(None)
 
-    def run(self):
+    def _generate(self) -> int:
         logging.info("Reporting in Progress...")
 
         _report_directory = self._config.get_str("report_directory")
@@ -258,7 +455,16 @@ class Generate_Reports(Thread):
         _full_report_file = os.path.abspath(os.path.join(_report_directory, _report_file_docx))
         _email_list_csv = self._config.get_str("email_list_csv")
         _full_csv_file = os.path.abspath(os.path.join(_report_directory, _email_list_csv))
+        _full_manifest_file = os.path.abspath(os.path.join(_report_directory, self._MANIFEST_FILE))
 
+        previous = self._read_manifest(_full_manifest_file) if self._config.get_bool("incremental_reports") else {}
+        report_cache = self._report_cache()
+        fingerprints : Dict[str, str] = {}
+        unchanged = 0
+
+        # Evaluate the pathway rules for every official in one pass
+        with self.perf.span("rules"):
+            self._df = self._df.assign(Recommendations=recommend(self._df))
 
         club_list_names_df = self._df.loc[self._df['AffiliatedClubs'].isnull(),['ClubCode','Club']].drop_duplicates()
         club_list_names = club_list_names_df.values.tolist()
@@ -274,18 +480,70 @@ class Generate_Reports(Thread):
         if self._config.get_bool("incl_pso_pending"):
             status_values.append("PSO Pending")
 
-        report_time = datetime.now().strftime("%B %d %Y %I:%M%p")
-
-        all_csv_entries = []
-
-        for club, club_full in club_list_names:
-            logging.info("Processing %s" % club_full)
-            club_data = self._df[(self._df["ClubCode"] == club)]
-            club_data = club_data[club_data["Status"].isin(status_values)]
-            club_stat = docgenCore(club, club_data, self._config)
-            club_csv = club_stat.dump_data_docx(club_full, report_time)
-            all_csv_entries.extend(club_csv)
-            club_summaries.append ([club, club_full, club_stat])
+        report_time = datetime.now().strftime(docgenCore.REPORT_DATE_FORMAT)
+
+        all_csv_entries : List = []
+
+        with self.perf.span("filter"):
+            club_data_sets = self._club_data_sets(club_list_names, status_values)
+        total_officials = sum(club_data.shape[0] for _, _, club_data in club_data_sets)
+        done_officials = 0
+
+        if self._outbox is not None:
+            # Nothing is written to disk, the email thread receives each document as it is produced
+            for club, club_full, club_data in club_data_sets:
+                if self.cancelled:
+                    break
+                logging.info("Processing %s" % club_full)
+                club_stat = docgenCore(club, club_data, self._config, perf=self.perf, filtered=True)
+                club_stat.dump_data_docx(club_full, report_time, outbox=self._outbox)
+                self.failed += club_stat.failed
+                done_officials += club_data.shape[0]
+                self.progress(done_officials, total_officials)
+            logging.info("Report Complete")
+            return done_officials
+
+        # The master document is assembled as the reports are produced rather than re-reading them from disk
+
+        template = docgenCore.new_template()
+        master = docgenMaster(template)
+
+        workers = self._config.get_int("report_workers")
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        # Starting the worker processes costs more than a handful of batches take to render, a small run is done here
+        batches = sum(-(-club_data.shape[0] // self._BATCH_SIZE) for _, _, club_data in club_data_sets)
+
+        if workers > 1 and batches >= workers * 2:
+            all_csv_entries, unchanged = self._run_parallel(club_data_sets, report_time, workers, template, master,
+                                                            previous, report_cache, fingerprints)
+        else:
+            for club, club_full, club_data in club_data_sets:
+                if self.cancelled:
+                    break
+                logging.info("Processing %s" % club_full)
+                club_stat = docgenCore(club, club_data, self._config, template=template, previous=previous, perf=self.perf,
+                                       filtered=True, reports=report_cache)
+                club_csv = club_stat.dump_data_docx(club_full, report_time, master=master)
+                all_csv_entries.extend(club_csv)
+                fingerprints.update(club_stat.fingerprints)
+                unchanged += club_stat.unchanged
+                self.failed += club_stat.failed
+                club_summaries.append ([club, club_full, club_stat])
+                done_officials += club_data.shape[0]
+                self.progress(done_officials, total_officials)
+
+        if unchanged:
+            logging.info("%d of %d reports unchanged, reused from an earlier run" % (unchanged, len(all_csv_entries)))
+        self.perf.count("reports", len(all_csv_entries))
+        self.perf.count("unchanged", unchanged)
+        # The reports saved so far are kept, so a cancelled run still records them
+        self._write_manifest(_full_manifest_file, fingerprints)
+        if report_cache is not None:
+            with self.perf.span("cache.evict"):
+                report_cache.evict()
+        if self.cancelled:
+            return len(all_csv_entries)
 
         # Create the email list CSV file    
         # 
@@ -296,47 +554,169 @@ class Generate_Reports(Thread):
         email_list_df = pd.DataFrame(all_csv_entries, columns=["Last Name", "First Name", "EMail", "Filename"])
 
         try:
-            email_list_df.to_csv(_full_csv_file, index=False)
+            with self.perf.span("csv"):
+                email_list_df.to_csv(_full_csv_file, index=False)
         except Exception as e:
+            self.failed += 1
             logging.info("Unable to save email list: {}".format(type(e).__name__))
             logging.info("Exception message: {}".format(e))
         
-        # Create the master document
+        # Save the master document
 
         logging.info("Creating master document")
 
-        number_of_sections=len(all_csv_entries)
-        master = Document()
-        composer = Composer(master)
-        for i in range(0, number_of_sections):
-            doc_temp = Document(all_csv_entries[i][3])
-            doc_temp.add_page_break()
-            composer.append(doc_temp)
-
         try:
-            composer.save(_full_report_file)
+            with self.perf.span("master.save"):
+                master.save(_full_report_file)
         except Exception as e:
+            self.failed += 1
             logging.info("Unable to save full report: {}".format(type(e).__name__))
             logging.info("Exception message: {}".format(e))
 
         logging.info("Report Complete")
+        return len(all_csv_entries)
+
+    def _report_cache(self) -> Optional[docgenReportCache]:
+        '''The cache of reports by content, None if reports are always rebuilt'''
+        cache_size = self._config.get_int("report_cache_size_mb")
+        if cache_size <= 0 or not self._config.get_bool("incremental_reports"):
+            return None
+        return docgenReportCache(os.path.join(self._config.get_str("cache_directory"), self._REPORT_CACHE_DIRECTORY),
+                                 cache_size * 1024 * 1024)
+
+    @staticmethod
+    def _read_manifest(filename: str) -> Dict[str, str]:
+        '''Report fingerprints from the previous run, empty if there isn't one'''
+        try:
+            with open(filename, "r", encoding="utf-8") as manifest:
+                return json.load(manifest)["reports"]
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logging.info("Ignoring report manifest: {}".format(type(e).__name__))
+            return {}
+
+    @staticmethod
+    def _write_manifest(filename: str, fingerprints: Dict[str, str]) -> None:
+        try:
+            with open(filename, "w", encoding="utf-8") as manifest:
+                json.dump({"reports": fingerprints}, manifest, indent=1)
+        except Exception as e:
+            logging.info("Unable to save report manifest: {}".format(type(e).__name__))
+            logging.info("Exception message: {}".format(e))
+
+    def _run_parallel(self, club_data_sets: List[Tuple[str, str, pd.DataFrame]], report_time: str, workers: int,
+                      template: docgenTemplate, master: docgenMaster, previous: Dict[str, str],
+                      report_cache: Optional[docgenReportCache], fingerprints: Dict[str, str]) -> Tuple[List, int]:
+        '''Generate the documents using a pool of worker processes
+
+        Returns the CSV entries in club order and the number of unchanged reports. The fingerprints of the
+        reports are added to fingerprints.
+
+        Batches are consumed in submission order so the email list and master document don't depend on
+        scheduling. Only a few batches per worker are in flight at once to keep memory bounded.
+        '''
 
+        batches = []
+        for club, club_full, club_data in club_data_sets:
+            for start in range(0, club_data.shape[0], self._BATCH_SIZE):
+                batches.append((club, club_full, club_data.iloc[start:start + self._BATCH_SIZE]))
 
-class Email_Reports(Thread):
-    def __init__(self, testmode:bool, config: docgenConfig):
+        total_officials = sum(batch[2].shape[0] for batch in batches)
+        logging.info("Generating reports for %d officials using %d processes" % (total_officials, workers))
+
+        all_csv_entries = []
+        unchanged = 0
+        done_officials = 0
+        pending : deque = deque()
+        next_batch = iter(batches)
+        # Always spawn (the Windows behaviour) - forking a process that is running Tk threads is unsafe
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_report_worker, initargs=(previous, report_cache)) as executor:
+            for club, club_full, club_data in islice(next_batch, workers * 2):
+                pending.append((club_full, club_data.shape[0], executor.submit(_generate_batch, club, club_full, club_data, self._config, report_time)))
+            while pending:
+                if self.cancelled:
+                    executor.shutdown(cancel_futures=True)
+                    break
+                club_full, batch_size, future = pending.popleft()
+                for club, next_full, club_data in islice(next_batch, 1):
+                    pending.append((next_full, club_data.shape[0], executor.submit(_generate_batch, club, next_full, club_data, self._config, report_time)))
+                try:
+                    club_csv, bodies, messages, batch_fingerprints, batch_unchanged, batch_failed, batch_spans = future.result()
+                except Exception as e:
+                    logging.info("Error processing %s: %s - %s" % (club_full, type(e).__name__, e))
+                    self.failed += batch_size
+                    continue
+                for message in messages:
+                    logging.info(message)
+                all_csv_entries.extend(club_csv)
+                fingerprints.update(batch_fingerprints)
+                unchanged += batch_unchanged
+                self.failed += batch_failed
+                # Worker time is CPU time spread over the processes, it can add up to more than the total
+                self.perf.merge(batch_spans, {})
+                with self.perf.span("master"):
+                    for body in bodies:
+                        template.load(body)
+                        template.append_to(master)
+                done_officials += batch_size
+                logging.info("Processed %s (%d of %d officials)" % (club_full, done_officials, total_officials))
+                self.progress(done_officials, total_officials)
+
+        return all_csv_entries, unchanged
+
+
+class Email_Reports(docgenJob):
+    '''Email the reports - the result is the number of emails sent'''
+    # Seconds to wait before the first retry of a failed message, doubled for each further retry
+    _RETRY_BACKOFF = 2.0
+    # Record of the emails sent for the current email list, kept next to it
+    _JOURNAL_FILE = "docgen-send-journal.jsonl"
+    # Encoded attachments, shared by every send so a test send followed by the real one encodes each report once
+    _ATTACHMENTS = docgenAttachmentCache(64 * 1024 * 1024)
+
+    def __init__(self, testmode:bool, config: docgenConfig, outbox: Optional[Queue] = None):
         super().__init__()
         self._testmode : bool = testmode
         self._config : docgenConfig = config
+        # Generate and send - the documents come from Generate_Reports instead of the email list
+        self._outbox = outbox
+        self._outbox_done = False
+        self._total = 0
+        # Emails already sent by an earlier run, and ones that couldn't be sent
+        self.skipped = 0
+        self.failed = 0
+        self.perf = docgenPerf.from_config("email", config)
         self._email_password : str = "EMPTY"
 
         self._email_smtp_server = self._config.get_str("email_smtp_server")
         self._email_smtp_port = self._config.get_str("email_smtp_port")
         self._email_smtp_user = self._config.get_str("email_smtp_user")
         self._email_from = self._config.get_str("email_from")
+        # Message-IDs use the sender's domain rather than the local hostname, which is often unqualified
+        _, at, domain = parseaddr(self._email_from)[1].rpartition("@")
+        self._msgid_domain = domain if at and domain else None
         self._email_subject = self._config.get_str("email_subject")
         self._email_body = self._config.get_str("email_body")
+        self._email_retries = self._config.get_int("email_retries")
+        self._rate_limiter = docgenRateLimiter(self._config.get_int("email_rate_limit"))
 
-    def run(self):
+    def execute(self) -> int:
+        try:
+            return self._send_all()
+        finally:
+            if self._outbox is not None and not self._outbox_done:
+                # Sending stopped early (test mode or an error), let Generate_Reports finish
+                for _ in iter(self._outbox.get, None):
+                    pass
+
+    def _from_outbox(self):
+        for entry in iter(self._outbox.get, None):
+            yield entry
+        self._outbox_done = True
+
+    def _send_all(self) -> int:
         logging.info("Sending E-Mails...")
 
         _report_directory = self._config.get_str("report_directory")
@@ -344,81 +724,175 @@ class Email_Reports(Thread):
         _full_csv_file = os.path.abspath(os.path.join(_report_directory, _email_list_csv))
 
         try:
-            self._email_password = keyring.get_password("SWON-DOCGEN", self._email_smtp_user)
+            # No user - the server doesn't need a login (e.g. a local relay), docgenSMTPPool won't log in
+            if self._email_smtp_user:
+                self._email_password = keyring.get_password("SWON-DOCGEN", self._email_smtp_user) or ""
         except Exception as e:
             logging.info("Unable to retrieve email password: {}".format(type(e).__name__))
             logging.info("Exception message: {}".format(e))
-            return
-        
-        print(self._email_password)
+            return 0
+
         if self._testmode:
             logging.info("Test Mode - Sending max (3) mails to {}".format(self._email_from))
 
+        if self._outbox is None:
+            try:
+                email_list_df = pd.read_csv(_full_csv_file)
+            except Exception as e:    
+                logging.info("Unable to load email list: {}".format(type(e).__name__))
+                logging.info("Exception message: {}".format(e))
+                return 0
+
+        pool = docgenSMTPPool(self._email_smtp_server, int(self._email_smtp_port), self._email_smtp_user, self._email_password,
+                              use_ssl=self._config.get_bool("email_smtp_ssl"),
+                              max_messages=self._config.get_int("email_messages_per_connection"))
         try:
-            email_list_df = pd.read_csv(_full_csv_file)
-        except Exception as e:    
-            logging.info("Unable to load email list: {}".format(type(e).__name__))
-            logging.info("Exception message: {}".format(e))
-            return    
-
-        context = ssl.create_default_context()
-   
-        try:
-            server = smtplib.SMTP_SSL(self._email_smtp_server, self._email_smtp_port, context=context)
-            server.login(self._email_smtp_user, self._email_password)
+            pool.connect()
         except Exception as e:
             logging.info("Unable to connect to email server: {}".format(type(e).__name__))
             logging.info("Exception message: {}".format(e))
-            return
+            return 0
 
-        # For each entry in the list encode the Document and send it.  In test mode, use sender address for to and limit to 5 files
+        # For each entry in the list encode the Document and send it.  In test mode, use sender address for to and limit to 3 files
 
-        for index, entry in email_list_df.iterrows():
-            if self._testmode and index > 2:
+        if self._outbox is not None:
+            email_list = self._from_outbox()
+            self._total = 0     # Unknown, the reports are still being generated
+        else:
+            email_list = ((*entry, None) for entry in
+                          email_list_df[["Last Name", "First Name", "EMail", "Filename"]].itertuples(index=False, name=None))
+            self._total = email_list_df.shape[0]
+        if self._testmode:
+            email_list = islice(email_list, 3)
+            self._total = min(self._total, 3)
+
+        # This thread builds the encoded messages ahead of the sending threads, which each borrow a connection
+        # from the pool.  Encoding overlaps with sending and a slow server response only holds up one message.
+        connections = max(1, self._config.get_int("email_connections"))
+        messages : Queue = Queue(maxsize=connections * 2)
+        results : List[bool] = []
+        # Test sends all go to email_from, so they aren't journalled.  Neither are generate and send runs, there is no list.
+        journal = None if self._testmode or self._outbox is not None else self._open_journal(_full_csv_file)
+        senders = [Thread(target=self._sender, args=(messages, pool, results, journal)) for _ in range(connections)]
+        for sender in senders:
+            sender.start()
+
+        self.skipped = 0
+        max_attempts = self._config.get_int("email_max_attempts")
+        for last_name, first_name, email, filename, content in email_list:
+            if self.cancelled:
                 break
-            logging.info(f'Sending email to {entry["Last Name"]}, {entry["First Name"]}  E-Mail: {entry["EMail"]}')
-
-            if self._testmode:
-                self._send_email(self._email_from, entry["Filename"], server)
-            else:
-                self._send_email(entry["EMail"], entry["Filename"], server)
-                
-
-        logging.info("Email Complete")
-    
-    def _send_email(self, email_address: str, filename: str, server) -> None:
+            if journal is not None and journal.sent(email, filename):
+                self.skipped += 1
+                continue
+            if journal is not None and max_attempts and journal.attempts(email, filename) >= max_attempts:
+                # Keeps failing (e.g. a bad address), don't let every rerun spend its retries on it
+                logging.info(f'Not sending to {last_name}, {first_name}  E-Mail: {email} - {max_attempts} attempts have failed')
+                results.append(False)
+                continue
+            logging.info(f'Sending email to {last_name}, {first_name}  E-Mail: {email}')
+            email_address = self._email_from if self._testmode else email
+            message_id = make_msgid(domain=self._msgid_domain)
+            try:
+                with self.perf.span("build"):
+                    text = self._build_message(email_address, filename, message_id, content)
+                messages.put((email, filename, message_id, text))
+            except Exception as e:
+                logging.info("Unable to send email: {}".format(type(e).__name__))
+                logging.info("Exception message: {}".format(e))
+                results.append(False)
+                if journal is not None:
+                    journal.record(email, filename, False, message_id, 0)
+
+        for _ in senders:
+            messages.put(None)
+        for sender in senders:
+            sender.join()
+        pool.close()
+        if journal is not None:
+            journal.close()
+
+        self.failed = results.count(False)
+        if self.skipped:
+            logging.info("%d emails already sent, skipped" % self.skipped)
+        logging.info("Email Complete - %d of %d sent" % (sum(results), len(results)))
+        return sum(results)
+
+    def _open_journal(self, email_list_csv: str) -> Optional[docgenSendJournal]:
+        '''Journal of the emails sent for this email list, so an interrupted send resumes where it stopped'''
+        # Generate_Reports rewrites the list, so a regenerated list (same path, new timestamp) is a new campaign
+        stat = os.stat(email_list_csv)
+        campaign = "%s:%d:%d" % (email_list_csv, stat.st_size, stat.st_mtime_ns)
+        try:
+            return docgenSendJournal(os.path.join(os.path.dirname(email_list_csv), self._JOURNAL_FILE), campaign)
+        except Exception as e:
+            logging.info("Unable to open send journal: {}".format(type(e).__name__))
+            logging.info("Exception message: {}".format(e))
+            return None
+
+    def _sender(self, messages: Queue, pool: docgenSMTPPool, results: List[bool], journal: Optional[docgenSendJournal]) -> None:
+        '''Sending thread - send the queued messages until a None is received'''
+        for email, filename, message_id, text in iter(messages.get, None):
+            if self.cancelled:
+                continue    # Leave the rest unsent (and unjournalled) for the next run
+            # The thread must keep taking messages until the None, or the producer blocks on the full queue
+            try:
+                with self.perf.span("send"):
+                    sent, attempts = self._send_email(self._email_from if self._testmode else email, text, pool)
+                self.perf.count("sent" if sent else "failed")
+                self.perf.count("attempts", attempts)
+                results.append(sent)
+                if journal is not None:
+                    journal.record(email, filename, sent, message_id, attempts)
+                self.progress(len(results) + self.skipped, self._total)
+            except Exception as e:     # pylint: disable=broad-except
+                logging.info("Unexpected error sending email: {} - {}".format(type(e).__name__, e))
+
+    def _build_message(self, email_address: str, filename: str, message_id: str, content: Optional[bytes] = None) -> bytes:
         # Create a multipart message and set headers
         message = MIMEMultipart()
         message["From"] = self._email_from
         message["To"] = email_address
         message["Subject"] = self._email_subject
+        message["Message-ID"] = message_id
 
         # Add body to email
         message.attach(MIMEText(self._email_body, "plain"))
 
-        # Open document file in binary mode
-        with open(filename, "rb") as attachment:
-            # Add file as application/octet-stream
-            # Email client can usually download this automatically as attachment
-            part = MIMEBase("application", "octet-stream")
-            part.set_payload(attachment.read())
-
-        # Encode file in ASCII characters to send by email
-        encoders.encode_base64(part)
+        # Add file as application/octet-stream, already encoded in ASCII characters to send by email
+        # Email client can usually download this automatically as attachment
+        part = MIMEBase("application", "octet-stream")
+        if content is None:
+            part.set_payload(self._ATTACHMENTS.encoded(filename))
+        else:
+            part.set_payload(self._ATTACHMENTS.encoded_content(content))
+        part["Content-Transfer-Encoding"] = "base64"
 
         # Add header as key/value pair to attachment part
         basename = os.path.basename(filename)
         part.add_header("Content-Disposition",f"attachment; filename= {basename}",)
 
-        # Add attachment to message and convert message to string
+        # Add attachment to message and convert message to the bytes sent on the wire (CRLF line endings)
         message.attach(part)
-        text = message.as_string()
+        return message.as_bytes(policy=SMTP)
 
-        # Log in to server using secure context and send email
-        try:
-            server.sendmail(self._email_from, email_address, text)
-        except Exception as e:
-            logging.info("Unable to send email: {}".format(type(e).__name__))
-            logging.info("Exception message: {}".format(e))
-
-            
\ No newline at end of file
+    def _send_email(self, email_address: str, text: bytes, pool: docgenSMTPPool) -> Tuple[bool, int]:
+        '''Send a built message, retrying with backoff if the server fails.  Returns whether it was sent and the attempts made'''
+        for attempt in range(1, self._email_retries + 2):
+            self._rate_limiter.wait()
+            try:
+                pool.sendmail(self._email_from, email_address, text)
+                return True, attempt
+            except smtplib.SMTPRecipientsRefused as e:
+                # Retrying won't help a rejected address
+                logging.info("Unable to send email: {}".format(type(e).__name__))
+                logging.info("Exception message: {}".format(e))
+                return False, attempt
+            except Exception as e:
+                if attempt > self._email_retries:
+                    logging.info("Unable to send email: {}".format(type(e).__name__))
+                    logging.info("Exception message: {}".format(e))
+                    return False, attempt
+                logging.info("Retrying email to {} after {}".format(email_address, type(e).__name__))
+                time.sleep(self._RETRY_BACKOFF * 2 ** (attempt - 1))
+        return False, self._email_retries + 1
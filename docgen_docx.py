@@ -0,0 +1,209 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' Word document template for the officials reports '''
+
+import copy
+import hashlib
+import io
+import json
+import zipfile
+from typing import IO, Dict, List, Set, Tuple, Union
+
+from docx import Document
+import docx
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+from lxml import etree
+
+
+class docgenTemplate:
+    '''Prebuilt skeleton of an officials report.
+
+    The heading, clinic table and styles are created once.  Each report is a deep copy of the
+    skeleton body with the placeholder text substituted and the recommended actions appended.
+    '''
+
+    REPORT_TITLE = "2023/24 Officials Development"
+    # Bump whenever the report layout changes so previously generated reports are rebuilt
+    VERSION = 1
+
+    def __init__(self, clinic_names: List[str]):
+        self.document = Document()
+        doc = self.document
+
+        doc.add_heading(self.REPORT_TITLE, 0)
+
+        p = doc.add_paragraph()
+        p.add_run("Report Date: {report_date}")
+        p.add_run("\n\nName: {last_name}, {first_name} (SNC ID # {registration_id})")
+        p.add_run("\n\nClub: {club_fullname} ({club_code})")
+        p.add_run("\n\nCurrent Certification Level: ")
+        p.add_run("{certification_level}")
+
+        table = doc.add_table(rows=1, cols=4)
+        self._set_row(table.rows[0].cells, ["Clinic", "Clinic Date", "Sign Off #1", "Sign Off #2"])
+        for row_num, clinic_name in enumerate(clinic_names):
+            self._set_row(table.add_row().cells, [clinic_name.replace("{", "{{").replace("}", "}}")] +
+                          ["{clinic_%d_%d}" % (row_num, col) for col in range(3)])
+        table.style = "Light Grid Accent 5"
+        table.autofit = True
+
+        doc.add_heading("Recommended Actions", 2)
+
+        # The action bullet is kept out of the skeleton and cloned once per recommendation
+        action = doc.add_paragraph("{action}", style="List Bullet")
+        self._action = action._p
+        self._action.getparent().remove(self._action)
+
+        # Remember which text elements need substitution so rendering doesn't have to search for them
+        self._skeleton = doc.element.body
+        self._slots : List[Tuple[int, str]] = []
+        for index, text in enumerate(self._skeleton.iter(qn("w:t"))):
+            if "{" in (text.text or ""):
+                self._slots.append((index, text.text))
+                text.set(qn("xml:space"), "preserve")
+
+        self._clinic_count = len(clinic_names)
+        self._body = self._skeleton
+        self._relationships = self._relationship_set(self.document.part.rels.xml)
+
+    def _set_row(self, cells, values: List[str]) -> None:
+        for cell, value in zip(cells, values):
+            cell.text = value
+        cells[0].paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.LEFT
+        for cell in cells[1:]:
+            cell.paragraphs[0].alignment = docx.enum.text.WD_ALIGN_PARAGRAPH.CENTER
+
+    def render(self, fields: Dict[str, str], clinics: List[Tuple[str, str, str]], actions: List[str]) -> None:
+        '''Fill a fresh copy of the skeleton and make it the body of the document'''
+        values = dict(fields)
+        for row_num, clinic in enumerate(clinics[:self._clinic_count]):
+            for col, value in enumerate(clinic):
+                values["clinic_%d_%d" % (row_num, col)] = value
+
+        body = copy.deepcopy(self._skeleton)
+        texts = list(body.iter(qn("w:t")))
+        for index, template_text in self._slots:
+            texts[index].text = template_text.format_map(values)
+
+        sect_pr = body.find(qn("w:sectPr"))
+        for action in actions:
+            p = copy.deepcopy(self._action)
+            p.find(".//" + qn("w:t")).text = action
+            sect_pr.addprevious(p)
+
+        self._replace_body(body)
+
+    def fingerprint(self, fields: Dict[str, str], clinics: List[Tuple[str, str, str]], actions: List[str]) -> str:
+        '''Hash of everything that goes into a report except the report date'''
+        content = [self.VERSION, self.REPORT_TITLE, {name: value for name, value in fields.items() if name != "report_date"},
+                   clinics[:self._clinic_count], actions]
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def _replace_body(self, body) -> None:
+        self.document.element.replace(self._body, body)
+        self._body = body
+
+    def save(self, filename: str) -> None:
+        '''Save the most recently rendered report'''
+        self.document.save(filename)
+
+    def to_bytes(self) -> bytes:
+        '''The most recently rendered report as the content of a .docx file'''
+        stream = io.BytesIO()
+        self.document.save(stream)
+        return stream.getvalue()
+
+    def body_xml(self) -> bytes:
+        '''The most recently rendered report body, used to hand reports between processes'''
+        return etree.tostring(self._body)
+
+    def load(self, body_xml: bytes) -> None:
+        '''Make a report body rendered elsewhere (see body_xml) the current report'''
+        self._replace_body(parse_xml(body_xml))
+
+    @staticmethod
+    def _relationship_set(rels_xml: bytes) -> Set[Tuple[str, str, str]]:
+        return {(rel.get("Id"), rel.get("Type"), rel.get("Target")) for rel in parse_xml(rels_xml)}
+
+    def load_file(self, filename: str) -> bool:
+        '''Make the body of a previously saved report the current report.
+
+        Returns False, leaving the current report alone, if the report's relationships aren't the
+        template's - e.g. it has been customized with a picture or hyperlink.  The body of such a
+        report refers to parts the master doesn't have, so it can't be appended to it.
+        '''
+        with zipfile.ZipFile(filename) as report:
+            if self._relationship_set(report.read("word/_rels/document.xml.rels")) != self._relationships:
+                return False
+            document = parse_xml(report.read("word/document.xml"))
+        self._replace_body(document.find(qn("w:body")))
+        return True
+
+    def append_to(self, master: "docgenMaster") -> None:
+        '''Move the current report into the master document - it can still be saved, but not appended again'''
+        master.append(self._body)
+
+
+class docgenMaster:
+    '''Master document holding every report rendered from one docgenTemplate.
+
+    docxcompose reconciles styles and numbering against the whole master for every document it
+    appends, which gets slower as the master grows.  All of our reports come from the same skeleton,
+    so the styles are reconciled once here and each report body is appended as-is.
+    '''
+
+    def __init__(self, template: docgenTemplate):
+        self.document = Document()
+        self.sections = 0
+        self._reconcile_styles(template.document)
+
+        body = self.document.element.body
+        self._sect_pr = body.find(qn("w:sectPr"))
+
+        # Page break that separates the reports
+        page_break = self.document.add_paragraph()
+        page_break.add_run().add_break(docx.enum.text.WD_BREAK.PAGE)
+        self._page_break = page_break._p
+        body.remove(self._page_break)
+
+    def _reconcile_styles(self, source) -> None:
+        '''Copy any style the template uses that the master doesn't define'''
+        # Numbering for the bulleted actions comes from the List Bullet style, so styles are all that's needed
+        master_styles = self.document.styles.element
+        defined = {style.get(qn("w:styleId")) for style in master_styles.iter(qn("w:style"))}
+        for style in source.styles.element.iter(qn("w:style")):
+            if style.get(qn("w:styleId")) not in defined:
+                master_styles.append(copy.deepcopy(style))
+
+    def append(self, body) -> None:
+        '''Move the content of a report body to the end of the master followed by a page break'''
+        for element in list(body):
+            if element.tag != qn("w:sectPr"):
+                self._sect_pr.addprevious(element)
+        self._sect_pr.addprevious(copy.deepcopy(self._page_break))
+        self.sections += 1
+
+    def save(self, filename: Union[str, IO[bytes]]) -> None:
+        '''Save the master document to a file name or a binary stream'''
+        self.document.save(filename)
@@ -0,0 +1,105 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' Long running jobs - progress, cancellation and results for the worker threads '''
+
+import logging
+import time
+from queue import Queue
+from threading import Event, Thread
+from typing import Any, NamedTuple, Optional
+
+from docgen_perf import docgenPerf
+
+
+class JobProgress(NamedTuple):
+    '''Progress of a job - total is 0 when it isn't known'''
+    done: int
+    total: int
+    rate: float             # Items a second
+    eta: Optional[float]    # Seconds remaining, None if unknown
+
+
+class JobDone(NamedTuple):
+    '''The last event of every job'''
+    result: Any
+    cancelled: bool
+    error: Optional[BaseException]
+
+
+class docgenJob(Thread):
+    '''A long running task on its own thread.
+
+    Subclasses implement execute(), calling progress() as items complete and checking cancelled
+    between items.  Progress and finally a JobDone are posted to events for the UI to consume.
+    Calling run() directly (as the command line does) runs the job on the calling thread.
+    The whole job is measured with perf, which by default only collects the timings.
+    '''
+
+    # Minimum seconds between progress events, the last item is always reported
+    _PROGRESS_INTERVAL = 0.1
+
+    def __init__(self):
+        # Not a daemon - closing the window lets a running job finish rather than killing it partway through
+        super().__init__()
+        self.events : Queue = Queue()
+        self.result : Any = None
+        self._cancel = Event()
+        self._start = time.monotonic()
+        self._last_progress = 0.0
+        self.perf : docgenPerf = docgenPerf(type(self).__name__, log=False)
+
+    def execute(self) -> Any:
+        '''Do the work and return the result'''
+        raise NotImplementedError
+
+    def run(self):
+        self._start = time.monotonic()
+        error = None
+        with self.perf.measure():
+            try:
+                self.result = self.execute()
+            except Exception as e:     # pylint: disable=broad-except
+                logging.info("Unexpected error: {} - {}".format(type(e).__name__, e))
+                error = e
+        if self.cancelled:
+            logging.info("Cancelled")
+        self.events.put(JobDone(self.result, self.cancelled, error))
+
+    def cancel(self) -> None:
+        '''Ask the job to stop at the next opportunity'''
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def progress(self, done: int, total: int = 0) -> None:
+        '''Report that done of total items are complete'''
+        now = time.monotonic()
+        if now - self._last_progress < self._PROGRESS_INTERVAL and done != total:
+            return
+        self._last_progress = now
+        elapsed = now - self._start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if total and rate > 0 else None
+        self.events.put(JobProgress(done, total, rate, eta))
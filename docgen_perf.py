@@ -0,0 +1,153 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' Performance instrumentation - named timing spans and counters for a run '''
+
+import cProfile
+import json
+import logging
+import os
+import platform
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from threading import Lock
+from typing import Dict, Iterator, Optional
+
+from config import docgenConfig
+
+try:
+    from version import DOCGEN_VERSION  # type: ignore
+except ImportError:     # Running from source, version.py is written by build.py
+    DOCGEN_VERSION = "unreleased"
+
+
+class docgenPerf:
+    '''Time spent in each named span of a run, and counters.
+
+    Spans can be entered from any thread and accumulate (calls and total seconds).  At the end of
+    measure() a summary is logged and a JSON report written as docgen-perf-<name>-<start time>.json
+    in the report directory, one per run so runs (and versions) can be compared.  cProfile
+    (a .prof file named the same way, the measuring thread only) and tracemalloc (peak memory) can
+    be switched on in the configuration.
+    '''
+
+    def __init__(self, name: str, directory: Optional[str] = None, profile: bool = False, trace_memory: bool = False,
+                 log: bool = True):
+        self.name = name
+        self._log = log
+        self._directory = directory
+        self._profile = profile
+        self._trace_memory = trace_memory
+        self._lock = Lock()
+        self.spans : Dict[str, Dict[str, float]] = {}
+        self.counters : Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, name: str, config: docgenConfig) -> "docgenPerf":
+        '''Instrumentation for a run with the options from the configuration'''
+        directory = config.get_str("report_directory") if config.get_bool("perf_report") else None
+        return cls(name, directory, config.get_bool("perf_profile"), config.get_bool("perf_tracemalloc"))
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        '''Time the enclosed block as part of the named span'''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        '''Add time measured elsewhere (e.g. in a worker process) to the named span'''
+        with self._lock:
+            span = self.spans.setdefault(name, {"calls": 0, "seconds": 0.0})
+            span["calls"] += calls
+            span["seconds"] += seconds
+
+    def count(self, name: str, increment: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + increment
+
+    def merge(self, spans: Dict[str, Dict[str, float]], counters: Dict[str, int]) -> None:
+        '''Add the spans and counters collected by another docgenPerf'''
+        for name, span in spans.items():
+            self.add(name, span["seconds"], int(span["calls"]))
+        for name, increment in counters.items():
+            self.count(name, increment)
+
+    @contextmanager
+    def measure(self) -> Iterator[None]:
+        '''Measure the whole run, then log the summary and write the reports'''
+        profiler = cProfile.Profile() if self._profile else None
+        trace_memory = self._trace_memory and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        if profiler is not None:
+            profiler.enable()
+        started = datetime.now()
+        try:
+            with self.span("total"):
+                yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            peak = None
+            if trace_memory:
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+            self._finish(started, peak, profiler)
+
+    def summary(self) -> str:
+        '''Spans, slowest first, and counters as text'''
+        lines = []
+        for name, span in sorted(self.spans.items(), key=lambda item: item[1]["seconds"], reverse=True):
+            lines.append("%-16s %9.3fs %8d calls" % (name, span["seconds"], span["calls"]))
+        for name, value in sorted(self.counters.items()):
+            lines.append("%-16s %9d" % (name, value))
+        return "\n".join(lines)
+
+    def _finish(self, started: datetime, peak: Optional[int], profiler: Optional[cProfile.Profile]) -> None:
+        if self._log:
+            logging.info("Performance (%s):\n%s" % (self.name, self.summary()))
+        if peak is not None:
+            logging.info("Peak traced memory %.1fMB" % (peak / 1e6))
+        if self._directory is None:
+            return
+        report = {
+            "run": self.name,
+            "version": DOCGEN_VERSION,
+            "started": started.isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "spans": self.spans,
+            "counters": self.counters,
+            "peak_memory": peak,
+        }
+        basename = os.path.join(self._directory, "docgen-perf-%s-%s" % (self.name, started.strftime("%Y%m%d-%H%M%S")))
+        try:
+            with open(basename + ".json", "w", encoding="utf-8") as output:
+                json.dump(report, output, indent=1)
+            if profiler is not None:
+                profiler.dump_stats(basename + ".prof")
+        except Exception as e:
+            logging.info("Unable to save performance report: {}".format(type(e).__name__))
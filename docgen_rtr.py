@@ -0,0 +1,183 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' RTR officials data - export parsing and record access '''
+
+from typing import Any, Iterator, List, NamedTuple, Tuple
+
+import pandas as pd
+from lxml import etree
+
+# Clinics tracked by the RTR and whether they have deck evaluations (sign-offs)
+CLINICS = {
+    "Introduction to Swimming Officiating": True,
+    "Safety Marshal": False,
+    "Judge of Stroke/Inspector of Turns": True,
+    "Chief Timekeeper": True,
+    "Clerk of Course": True,
+    "Meet Manager": True,
+    "Starter": True,
+    "Chief Finish Judge/Chief Judge": True,
+    "Recorder-Scorer": False,
+    "Referee": False,
+    "Para Swimming eModule": False,
+}
+
+
+def clinic_date_columns(clinic: str) -> List[str]:
+    '''The clinic date column followed by the deck evaluation date columns (if any)'''
+    if CLINICS[clinic]:
+        return [clinic + "-ClinicDate", clinic + "-Deck Evaluation #1 Date", clinic + "-Deck Evaluation #2 Date"]
+    return [clinic + "-ClinicDate"]
+
+
+# Columns of the RTR export that docgen uses, everything else is dropped when loading
+TEXT_COLUMNS = ["Registration Id", "Last Name", "First Name", "Email"]
+CATEGORY_COLUMNS = ["Status", "ClubCode", "Club", "AffiliatedClubs", "Current_CertificationLevel"]
+FLAG_COLUMNS = list(CLINICS)     # yes/no - has the official taken the clinic, loaded as booleans
+DATE_COLUMNS = [column for clinic in CLINICS for column in clinic_date_columns(clinic)]
+RTR_COLUMNS = TEXT_COLUMNS + CATEGORY_COLUMNS + FLAG_COLUMNS + DATE_COLUMNS
+
+
+# The RTR's other "empty" date, alongside blank
+EMPTY_DATE = "0001-01-01"
+
+
+def to_dates(values: pd.Series) -> pd.Series:
+    '''RTR dates as datetime64 - blank, 0001-01-01 and anything else that isn't a date is NaT
+
+    0001-01-01 is removed explicitly, recent pandas versions can represent it as a real date.
+
+    >>> to_dates(pd.Series(["2023-08-14", "0001-01-01", "", None, "garbage"])).isna().tolist()
+    [False, True, True, True, True]
+    '''
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.where(values.dt.year > 1)
+    values = values.where(~values.isin([EMPTY_DATE, ""]))
+    return pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+
+
+class Official(NamedTuple):
+    '''The fields of one official used to produce a report'''
+    registration_id: str
+    last_name: str
+    first_name: str
+    email: str
+    certification_level: Any    # NaN if the official has no certification
+    recommendations: List[str]
+    dates: Tuple                # Values of the requested date columns, in order
+
+
+# RTR column for each of the Official fields (other than dates)
+OFFICIAL_COLUMNS = ["Registration Id", "Last Name", "First Name", "Email", "Current_CertificationLevel", "Recommendations"]
+
+
+def iter_officials(df: pd.DataFrame, date_columns: List[str]) -> Iterator[Official]:
+    '''Iterate over the officials without building a Series for every row (as iterrows does)
+
+    Dates are returned as YYYY-MM-DD strings (or NaN) whether or not the columns have been converted to datetime64.
+    '''
+    fields = len(OFFICIAL_COLUMNS)
+    records = df[OFFICIAL_COLUMNS + date_columns]
+    date_formatted = {column: records[column].dt.strftime("%Y-%m-%d") for column in date_columns
+                      if pd.api.types.is_datetime64_any_dtype(records[column])}
+    if date_formatted:
+        records = records.assign(**date_formatted)
+    for row in records.itertuples(index=False, name=None):
+        yield Official._make(row[:fields] + (row[fields:],))
+
+
+def _cell_text(cell) -> str:
+    # Same whitespace handling as pd.read_html
+    return " ".join("".join(cell.itertext()).split())
+
+
+def read_rtr_export(filename: str) -> pd.DataFrame:
+    '''Read an RTR officials export.
+
+    The export is an HTML table (saved with an .xls extension) whose first row holds the column names.
+    Rows are parsed one at a time and only the columns in RTR_COLUMNS are kept, then converted
+    with normalize_officials.
+    '''
+    header = None
+    keep : List[int] = []
+    rows : List[List[Any]] = []
+    for _, tr in etree.iterparse(filename, events=("end",), tag="tr", html=True):
+        cells = [_cell_text(cell) for cell in tr if cell.tag in ("td", "th")]
+        if header is None:
+            header = cells
+            if "Registration Id" not in header:
+                raise ValueError("Not an RTR officials export - no Registration Id column")
+            keep = [header.index(column) if column in header else -1 for column in RTR_COLUMNS]
+        else:
+            cells.append("")        # Missing columns (index -1) read as blank
+            rows.append([(cells[index] if index < len(cells) else "") or None for index in keep])
+        # Free the parsed rows as we go, only the values we kept are needed
+        tr.clear()
+        while tr.getprevious() is not None:
+            del tr.getparent()[0]
+
+    if header is None:
+        raise ValueError("Not an RTR officials export - no table found")
+
+    return normalize_officials(pd.DataFrame(rows, columns=RTR_COLUMNS))
+
+
+def normalize_officials(df: pd.DataFrame) -> pd.DataFrame:
+    '''Reduce a frame of RTR export text to the columns docgen uses, in their compact types.
+
+    Only RTR_COLUMNS are kept (any the export lacks are added blank) and blank registrations are
+    dropped.  Flags become nullable booleans (yes/Yes is True, no is False, blank is NA), repeated
+    values categoricals and dates datetime64 (blank, 0001-01-01 and anything else that isn't a
+    date is NaT).
+    '''
+    df = df.reindex(columns=RTR_COLUMNS)
+    df = df[df["Registration Id"].notnull()].reset_index(drop=True)
+
+    for column in FLAG_COLUMNS:
+        df[column] = df[column].astype(str).str.lower().map({"yes": True, "no": False}).astype("boolean")
+    for column in CATEGORY_COLUMNS:
+        df[column] = df[column].astype("category")
+    for column in DATE_COLUMNS:
+        df[column] = to_dates(df[column])
+    return df
+
+
+def merge_rtr_exports(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    '''Combine several loaded exports into one, keeping one record per Registration Id.
+
+    The frames are concatenated once and where an official appears more than once the record from the
+    later frame wins, so pass the exports oldest first.  Columns that were categorical stay categorical.
+    '''
+    frames = [df for df in frames if not df.empty]
+    if len(frames) == 1:
+        return frames[0]
+    if not frames:
+        return pd.DataFrame()
+    categorical = {column for df in frames for column in df.columns if isinstance(df[column].dtype, pd.CategoricalDtype)}
+    # Concatenating categoricals with different categories gives object columns, convert them back afterwards
+    df = pd.concat(frames, axis=0, ignore_index=True)
+    df = df.drop_duplicates(subset="Registration Id", keep="last").reset_index(drop=True)
+    for column in categorical:
+        if not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype("category")
+    return df
@@ -0,0 +1,146 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' Pathway rules - recommended actions for each official '''
+
+import numpy as np
+import pandas as pd
+
+from docgen_rtr import to_dates
+
+INTRO = "Introduction to Swimming Officiating"
+SAFETY = "Safety Marshal"
+STROKE_TURN = "Judge of Stroke/Inspector of Turns"
+LEVEL_II_CLINICS = ["Chief Timekeeper", "Clerk of Course", "Meet Manager", "Starter", "Chief Finish Judge/Chief Judge"]
+
+# Recommended action codes and the text used for them in the reports
+ACTIONS = {
+    "INTRO_CLINIC": "Take Introduction to Swimming Officiating Clinic and obtain sign-offs",
+    "INTRO_SIGNOFF_1": "Obtain 1 sign-off(s) for Introduction to Swimming Officiating",
+    "INTRO_SIGNOFF_2": "Obtain 2 sign-off(s) for Introduction to Swimming Officiating",
+    "SAFETY_CLINIC": "Take Safety Marshal Clinc",
+    "ST_CLINIC": "Take Judge of Stroke/Inspector of Turns Clinic",
+    "ST_SIGNOFF_1": "Obtain 1 sign-off(s) for Judge of Stroke/Inspector of Turns",
+    "ST_SIGNOFF_2": "Obtain 2 sign-off(s) for Judge of Stroke/Inspector of Turns",
+    "LEVEL2_CLINIC": "Take a Level II clinic (CT, MM, CFJ/CJE, Admin Desk or Starter) and obtain sign-offs",
+    "LEVEL2_SIGNOFF": "Obtain sign-offs on at least 1 Level II clinic (CT, MM, CFJ/CJE, Admin Desk or Starter)",
+}
+
+
+def valid_dates(dates: pd.Series) -> pd.Series:
+    '''True where the RTR date is a real date (not blank, 0001-01-01 or garbage)'''
+    return to_dates(dates).notna()
+
+
+def count_signoffs(df: pd.DataFrame, clinic: str) -> np.ndarray:
+    '''Number of deck evaluations (0-2) completed for the clinic'''
+    return (valid_dates(df[clinic + "-Deck Evaluation #1 Date"]).to_numpy(dtype=int) +
+            valid_dates(df[clinic + "-Deck Evaluation #2 Date"]).to_numpy(dtype=int))
+
+
+def not_taken(df: pd.DataFrame, clinic: str) -> np.ndarray:
+    '''True where the official hasn't taken the clinic (the flag is "no", or False once normalized)'''
+    flags = df[clinic]
+    if pd.api.types.is_bool_dtype(flags):
+        return (flags == False).fillna(False).to_numpy(dtype=bool)   # pylint: disable=singleton-comparison
+    return (flags.astype(str).str.lower() == "no").to_numpy()
+
+
+def _signoff_codes(prefix: str, signoffs: np.ndarray) -> np.ndarray:
+    return np.where(signoffs == 0, prefix + "_SIGNOFF_2", prefix + "_SIGNOFF_1").astype(object)
+
+
+def recommend(df: pd.DataFrame) -> pd.Series:
+    '''Evaluate the pathway rules for every official.
+
+    Returns a series (aligned with df) holding the list of action codes for each official,
+    in the order they appear in the report.  See ACTIONS for the text of each code.
+
+    >>> def official(level=None, taken=(), intro_signoffs=0, st_signoffs=0):
+    ...     row = {"Current_CertificationLevel": level}
+    ...     for clinic in [INTRO, SAFETY, STROKE_TURN] + LEVEL_II_CLINICS:
+    ...         row[clinic] = "yes" if clinic in taken else "no"
+    ...     for clinic, signoffs in [(INTRO, intro_signoffs), (STROKE_TURN, st_signoffs)]:
+    ...         for n in (1, 2):
+    ...             row["%s-Deck Evaluation #%d Date" % (clinic, n)] = "2023-01-15" if n <= signoffs else "0001-01-01"
+    ...     return row
+    >>> level_1 = "LEVEL I - RED PIN"
+    >>> df = pd.DataFrame([
+    ...     official(),
+    ...     official(taken=[INTRO, SAFETY]),
+    ...     official(taken=[INTRO], intro_signoffs=1),
+    ...     official(taken=[INTRO, SAFETY], intro_signoffs=2),
+    ...     official(level_1, taken=[INTRO, SAFETY], intro_signoffs=2),
+    ...     official(level_1, taken=[INTRO, SAFETY, STROKE_TURN], intro_signoffs=1, st_signoffs=1),
+    ...     official(level_1, taken=[INTRO, SAFETY, STROKE_TURN], intro_signoffs=2, st_signoffs=1),
+    ...     official(level_1, taken=[INTRO, SAFETY, STROKE_TURN, "Starter"], intro_signoffs=2, st_signoffs=2),
+    ... ])
+    >>> for actions in recommend(df):
+    ...     print(actions)
+    ['INTRO_CLINIC', 'SAFETY_CLINIC']
+    ['INTRO_SIGNOFF_2']
+    ['INTRO_SIGNOFF_1', 'SAFETY_CLINIC']
+    []
+    ['ST_CLINIC']
+    ['INTRO_SIGNOFF_1', 'ST_SIGNOFF_1']
+    ['ST_SIGNOFF_1', 'LEVEL2_CLINIC']
+    ['LEVEL2_SIGNOFF']
+    '''
+    rows = df.shape[0]
+    level = df["Current_CertificationLevel"]
+    no_level = level.isnull().to_numpy()
+    level_1 = (level == "LEVEL I - RED PIN").to_numpy()
+
+    intro_missing = not_taken(df, INTRO)
+    intro_signoffs = count_signoffs(df, INTRO)
+    st_missing = not_taken(df, STROKE_TURN)
+    st_signoffs = count_signoffs(df, STROKE_TURN)
+
+    # Each official gets at most one action from each of these columns, in this order
+    intro = np.full(rows, None, dtype=object)
+    safety = np.full(rows, None, dtype=object)
+    stroke_turn = np.full(rows, None, dtype=object)
+    level_2 = np.full(rows, None, dtype=object)
+
+    # For NoLevel officials, identify what they need to do to get to Level I
+
+    intro[no_level & intro_missing] = "INTRO_CLINIC"
+    mask = no_level & ~intro_missing & (intro_signoffs < 2)
+    intro[mask] = _signoff_codes("INTRO", intro_signoffs[mask])
+    safety[no_level & not_taken(df, SAFETY)] = "SAFETY_CLINIC"
+
+    # For Level I officials - check if they have stroke & turn and have completed 2 sign-offs
+
+    mask = level_1 & (intro_signoffs < 2)
+    intro[mask] = _signoff_codes("INTRO", intro_signoffs[mask])
+    stroke_turn[level_1 & st_missing] = "ST_CLINIC"
+    mask = level_1 & ~st_missing & (st_signoffs < 2)
+    stroke_turn[mask] = _signoff_codes("ST", st_signoffs[mask])
+
+    # Officials that have completed or nearly completed the "core" requirements move on to Level II
+    core_done = level_1 & ~st_missing & (intro_signoffs + st_signoffs >= 3)
+    no_level_2 = np.logical_and.reduce([not_taken(df, clinic) for clinic in LEVEL_II_CLINICS])
+    level_2[core_done & no_level_2] = "LEVEL2_CLINIC"
+    level_2[core_done & ~no_level_2] = "LEVEL2_SIGNOFF"
+
+    actions = [[code for code in official if code is not None] for official in zip(intro, safety, stroke_turn, level_2)]
+    return pd.Series(actions, index=df.index, name="Recommendations", dtype=object)
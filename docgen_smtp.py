@@ -0,0 +1,276 @@
+# DocGen - https://github.com/dmanusrex/docgen
+#
+# Copyright (C) 2023 - Darren Richer
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+''' SMTP connection pool, rate limiting, send journal and attachment encoding for sending the reports '''
+
+import base64
+import hashlib
+import json
+import logging
+import mmap
+import os
+import smtplib
+import ssl
+import time
+from collections import OrderedDict, deque
+from threading import Lock
+from typing import Deque, Dict, Set, Tuple
+
+
+class docgenSMTPPool:
+    '''Authenticated SMTP connections shared by the sending threads.
+
+    A connection is taken from the pool for each message and returned afterwards.  Connections are
+    closed and replaced after max_messages (0 = no limit) or when sending on them fails.
+    '''
+
+    def __init__(self, host: str, port: int, user: str, password: str, use_ssl: bool = True, max_messages: int = 0):
+        self._host = host
+        self._port = port
+        self._user = user
+        self._password = password
+        self._use_ssl = use_ssl
+        self._max_messages = max_messages
+        self._context = ssl.create_default_context()
+        self._idle : Deque[Tuple[smtplib.SMTP, int]] = deque()
+        self._lock = Lock()
+
+    def connect(self) -> None:
+        '''Open a connection and add it to the pool, raises if the server can't be reached or login fails'''
+        self._release(self._open(), 0)
+
+    def _open(self) -> smtplib.SMTP:
+        if self._use_ssl:
+            server : smtplib.SMTP = smtplib.SMTP_SSL(self._host, self._port, context=self._context)
+        else:
+            server = smtplib.SMTP(self._host, self._port)
+        if self._user:
+            server.login(self._user, self._password)
+        return server
+
+    def _acquire(self) -> Tuple[smtplib.SMTP, int]:
+        with self._lock:
+            if self._idle:
+                return self._idle.popleft()
+        return self._open(), 0
+
+    def _release(self, server: smtplib.SMTP, sent: int) -> None:
+        if self._max_messages > 0 and sent >= self._max_messages:
+            self._quit(server)
+            return
+        with self._lock:
+            self._idle.append((server, sent))
+
+    @staticmethod
+    def _quit(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def sendmail(self, from_address: str, to_address: str, message: bytes) -> None:
+        '''Send a message on a pooled connection'''
+        server, sent = self._acquire()
+        try:
+            server.sendmail(from_address, to_address, message)
+        except smtplib.SMTPRecipientsRefused:
+            # The connection is still good, only this message failed
+            self._release(server, sent)
+            raise
+        except Exception:
+            self._quit(server)
+            raise
+        self._release(server, sent + 1)
+
+    def close(self) -> None:
+        '''Close the idle connections'''
+        with self._lock:
+            idle, self._idle = self._idle, deque()
+        for server, _ in idle:
+            self._quit(server)
+
+
+class docgenRateLimiter:
+    '''Space out events so there are at most per_minute of them a minute (0 = no limit)'''
+
+    def __init__(self, per_minute: int):
+        self._interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = Lock()
+
+    def wait(self) -> None:
+        '''Block until the next event is allowed'''
+        if not self._interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self._interval
+        time.sleep(start - now)
+
+
+class docgenSendJournal:
+    '''Append-only record of the emails sent for one email list, so an interrupted send can be resumed.
+
+    Each line is a JSON record with the recipient, report file, status ("sent" or "failed"),
+    message id and number of attempts.  The journal belongs to a campaign (the email list as
+    last generated) and is started afresh when the campaign changes.
+
+    >>> import os, tempfile
+    >>> filename = os.path.join(tempfile.mkdtemp(), "journal.jsonl")
+    >>> journal = docgenSendJournal(filename, "list-1")
+    >>> journal.record("a@club.ca", "a.docx", True, "<1@club.ca>", 1)
+    >>> journal.record("b@club.ca", "b.docx", False, "<2@club.ca>", 3)
+    >>> journal.close()
+
+    Resuming the same campaign skips the reports already sent and carries the attempts over
+    >>> journal = docgenSendJournal(filename, "list-1")
+    >>> journal.sent("a@club.ca", "a.docx"), journal.sent("b@club.ca", "b.docx"), journal.attempts("b@club.ca", "b.docx")
+    (True, False, 3)
+    >>> journal.record("b@club.ca", "b.docx", True, "<3@club.ca>", 1)
+    >>> journal.close()
+
+    A record cut short by a crash is dropped, and the next one starts on a line of its own
+    >>> with open(filename, "a", encoding="utf-8") as partial:
+    ...     _ = partial.write('{"email": "c@club.ca", "filen')
+    >>> journal = docgenSendJournal(filename, "list-1")
+    >>> journal.sent("b@club.ca", "b.docx"), journal.attempts("b@club.ca", "b.docx"), journal.sent("c@club.ca", "c.docx")
+    (True, 4, False)
+    >>> journal.record("c@club.ca", "c.docx", True, "<4@club.ca>", 1)
+    >>> journal.close()
+    >>> journal = docgenSendJournal(filename, "list-1")
+    >>> journal.sent("c@club.ca", "c.docx")
+    True
+    >>> journal.close()
+
+    A new campaign starts the journal afresh
+    >>> journal = docgenSendJournal(filename, "list-2")
+    >>> journal.sent("a@club.ca", "a.docx"), journal.attempts("b@club.ca", "b.docx")
+    (False, 0)
+    >>> journal.close()
+    '''
+
+    def __init__(self, filename: str, campaign: str):
+        self._lock = Lock()
+        self._attempts : Dict[Tuple[str, str], int] = {}
+        self._sent : Set[Tuple[str, str]] = set()
+
+        records = []
+        complete = True
+        try:
+            with open(filename, "r", encoding="utf-8") as journal:
+                for line in journal:
+                    complete = line.endswith("\n")
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        pass    # Cut short by a crash
+        except FileNotFoundError:
+            pass
+        if records and records[0].get("campaign") != campaign:
+            records = []
+
+        for record in records[1:]:
+            key = (record["email"], record["filename"])
+            self._attempts[key] = self._attempts.get(key, 0) + record["attempts"]
+            if record["status"] == "sent":
+                self._sent.add(key)
+
+        self._journal = open(filename, "a" if records else "w", encoding="utf-8")
+        if not records:
+            self._write({"campaign": campaign})
+        elif not complete:
+            self._journal.write("\n")
+
+    def _write(self, record: Dict) -> None:
+        # Losing a record only means the email could be sent again on a rerun, so carry on sending
+        try:
+            self._journal.write(json.dumps(record) + "\n")
+            self._journal.flush()
+        except (OSError, ValueError) as e:
+            logging.info("Unable to update send journal: {}".format(type(e).__name__))
+
+    def sent(self, email: str, filename: str) -> bool:
+        '''True if the report has already been delivered to the recipient'''
+        return (email, filename) in self._sent
+
+    def record(self, email: str, filename: str, sent: bool, message_id: str, attempts: int) -> None:
+        '''Record the outcome of sending a report'''
+        with self._lock:
+            key = (email, filename)
+            self._attempts[key] = self._attempts.get(key, 0) + attempts
+            if sent:
+                self._sent.add(key)
+            self._write({"email": email, "filename": filename, "status": "sent" if sent else "failed",
+                         "message_id": message_id, "attempts": attempts})
+
+    def attempts(self, email: str, filename: str) -> int:
+        '''Attempts made to send the report across all runs'''
+        return self._attempts.get((email, filename), 0)
+
+    def close(self) -> None:
+        self._journal.close()
+
+
+class docgenAttachmentCache:
+    '''Base64 encoded attachments, keyed by the SHA-256 of the file content.
+
+    Files are memory mapped and encoded in chunks, and the encoded text is kept (up to max_bytes,
+    least recently used first out) so sending the same report again - a test send followed by the
+    real one - doesn't encode it again.
+    '''
+
+    # Multiple of the 57 bytes that make up one 76 character base64 line
+    _CHUNK = 57 * 1024
+
+    def __init__(self, max_bytes: int):
+        self._max_bytes = max_bytes
+        self._size = 0
+        self._encoded : "OrderedDict[str, str]" = OrderedDict()
+        self._lock = Lock()
+
+    def encoded(self, filename: str) -> str:
+        '''The file content as base64 lines, as used for a base64 Content-Transfer-Encoding'''
+        with open(filename, "rb") as attachment:
+            if os.fstat(attachment.fileno()).st_size == 0:
+                return ""
+            with mmap.mmap(attachment.fileno(), 0, access=mmap.ACCESS_READ) as content:
+                return self.encoded_content(content)
+
+    def encoded_content(self, content) -> str:
+        '''Base64 lines for an attachment held in memory (bytes or any buffer)'''
+        key = hashlib.sha256(content).hexdigest()
+        with self._lock:
+            if key in self._encoded:
+                self._encoded.move_to_end(key)
+                return self._encoded[key]
+        encoded = "".join(base64.encodebytes(content[start:start + self._CHUNK]).decode("ascii")
+                          for start in range(0, len(content), self._CHUNK))
+
+        with self._lock:
+            if key not in self._encoded and len(encoded) <= self._max_bytes:
+                self._encoded[key] = encoded
+                self._size += len(encoded)
+                while self._size > self._max_bytes:
+                    _, evicted = self._encoded.popitem(last=False)
+                    self._size -= len(evicted)
+        return encoded
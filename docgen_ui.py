@@ -24,32 +24,134 @@
 ''' DocGen Main Screen '''
 
 import os
-import pandas as pd
 import logging
 import customtkinter as ctk
-import keyring
 import webbrowser
 import tkinter as tk
 from tkinter import filedialog, ttk, BooleanVar, StringVar,  HORIZONTAL
-from typing import Any
+from typing import Any, Callable, List
+from queue import Queue, SimpleQueue
 from tooltip import ToolTip
 
 # Appliction Specific Imports
 from config import docgenConfig
 from version import DOCGEN_VERSION
-from docgen_core import TextHandler, Data_Loader, Generate_Reports, Email_Reports
+from docgen_job import JobDone, JobProgress
 
 tkContainer = Any
 
+
+def _core():
+    '''docgen_core pulls in pandas, python-docx and the email modules, so it is imported on first use
+    (docgen.py also warms it up in the background once the window is showing)'''
+    import docgen_core   # pylint: disable=import-outside-toplevel
+    return docgen_core
+
+class TextHandler(logging.Handler):
+    # This class allows you to log to a Tkinter Text or ScrolledText widget
+    # Adapted from Moshe Kaplan: https://gist.github.com/moshekaplan/c425f861de7bbf28ef06
+    #
+    # Records are queued (from any thread) and written to the widget in batches by the Tk thread,
+    # so a busy worker can't flood the event loop.  Only the last max_lines lines are kept.
+
+    # Milliseconds between updates of the widget
+    FLUSH_INTERVAL = 200
+
+    def __init__(self, text, max_lines: int = 5000):
+        # run the regular Handler __init__
+        logging.Handler.__init__(self)
+        # Store a reference to the Text it will log to
+        self.text = text
+        self.max_lines = max_lines
+        self._pending : SimpleQueue = SimpleQueue()
+        self.text.after(self.FLUSH_INTERVAL, self._flush)
+
+    def emit(self, record):
+        # This is necessary because we can't modify the Text from other threads
+        self._pending.put(self.format(record))
+
+    def _flush(self):
+        messages = []
+        while not self._pending.empty():
+            messages.append(self._pending.get())
+        if messages:
+            messages = messages[-self.max_lines:]
+            self.text.configure(state='normal')
+            self.text.insert(tk.END, "\n".join(messages) + '\n')
+            # Drop the oldest lines beyond the limit (the text always ends with an empty line)
+            excess = int(self.text.index("end-1c").split(".")[0]) - 1 - self.max_lines
+            if excess > 0:
+                self.text.delete("1.0", "%d.0" % (excess + 1))
+            self.text.configure(state='disabled')
+            # Autoscroll to the bottom
+            self.text.yview(tk.END)
+        self.text.after(self.FLUSH_INTERVAL, self._flush)
+
+class _Job_Status(ctk.CTkFrame):   # pylint: disable=too-many-ancestors
+    '''Progress bar, status and Cancel button for the running jobs'''
+    def __init__(self, container: tkContainer):
+        super().__init__(container)
+        self.columnconfigure(0, weight=1)
+        self._progress = ctk.CTkProgressBar(self)
+        self._progress.grid(column=0, row=0, sticky="ew", padx=20, pady=10)
+        self._progress.set(0)
+        self._status = StringVar(value="")
+        ctk.CTkLabel(self, textvariable=self._status, anchor="w").grid(column=1, row=0, sticky="w", padx=10)
+        self._cancel_btn = ctk.CTkButton(self, text="Cancel", command=self._handle_cancel_btn, state="disabled")
+        self._cancel_btn.grid(column=2, row=0, padx=20, pady=10)
+        self._jobs : List = []
+
+    def watch(self, jobs: List, on_done: Callable[[JobDone], None]) -> None:
+        '''Show the progress of the first of the (started) jobs, on_done gets the JobDone of the last one
+
+        With generate and send the reports job knows how many officials there are, and the email job finishes last.
+        '''
+        self._jobs = jobs
+        self._progress.set(0)
+        self._status.set("")
+        self._cancel_btn.configure(state="normal")
+        self._check(on_done)
+
+    def _check(self, on_done: Callable[[JobDone], None]) -> None:
+        for job in self._jobs:
+            while not job.events.empty():
+                event = job.events.get_nowait()
+                if isinstance(event, JobProgress) and job is self._jobs[0]:
+                    self._show(event)
+                elif isinstance(event, JobDone) and job is self._jobs[-1]:
+                    self._cancel_btn.configure(state="disabled")
+                    self._status.set("Cancelled" if event.cancelled else "")
+                    self._jobs = []
+                    on_done(event)
+                    return
+        # check the jobs every 100ms
+        self.after(100, lambda: self._check(on_done))
+
+    def _show(self, event: JobProgress) -> None:
+        if event.total:
+            self._progress.set(event.done / event.total)
+        status = "%d" % event.done + (" of %d" % event.total if event.total else "")
+        status += "  %.1f/s" % event.rate
+        if event.eta is not None:
+            status += "  %d:%02d remaining" % divmod(int(event.eta), 60)
+        self._status.set(status)
+
+    def _handle_cancel_btn(self) -> None:
+        for job in self._jobs:
+            job.cancel()
+        self._cancel_btn.configure(state="disabled")
+
+
 class _Generate_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancestors
     '''Generate Word Documents from a supplied RTR file'''
     def __init__(self, container: tkContainer, config: docgenConfig):
         super().__init__(container)
         self._config = config
 
-        self.df = pd.DataFrame()
+        self.df = None      # Officials DataFrame, None until an export is loaded
         self._officials_list = StringVar(value=self._config.get_str("officials_list"))
         self._officials_list_filename = StringVar(value=os.path.basename(self._officials_list.get()))
+        self._officials_files : List[str] = []     # Exports chosen together, loaded and merged in one step
         self._report_directory = StringVar(value=self._config.get_str("report_directory"))
         self._report_file = StringVar(value=self._config.get_str("report_file_docx"))
         self._ctk_theme = StringVar(value=self._config.get_str("Theme"))
@@ -80,7 +182,7 @@ class _Generate_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancest
 
         btn1 = ctk.CTkButton(filesframe, text="RTR List", command=self._handle_officials_browse)
         btn1.grid(column=0, row=1, padx=20, pady=10)
-        ToolTip(btn1, text="Select the RTR officials export file")   # pylint: disable=C0330
+        ToolTip(btn1, text="Select the RTR officials export file (or several to merge)")   # pylint: disable=C0330
         ctk.CTkLabel(filesframe, textvariable=self._officials_list_filename).grid(column=1, row=1, sticky="w")
 
         btn2 = ctk.CTkButton(filesframe, text="Report Directory", command=self._handle_report_dir_browse)
@@ -144,14 +246,24 @@ class _Generate_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancest
         self.reset_btn.grid(column=1, row=1, sticky="news", padx=20, pady=10)
         self.reports_btn = ctk.CTkButton(buttonsframe, text="Generate Reports", command=self._handle_reports_btn)
         self.reports_btn.grid(column=2, row=1, sticky="news", padx=20, pady=10)
+        self.send_btn = ctk.CTkButton(buttonsframe, text="Generate & Email", command=self._handle_send_btn)
+        self.send_btn.grid(column=3, row=1, sticky="news", padx=20, pady=10)
+        ToolTip(self.send_btn, text="Email each report as it is generated, without saving the files")   # pylint: disable=C0330
+        self.job_status = _Job_Status(buttonsframe)
+        self.job_status.grid(column=0, row=2, columnspan=4, sticky="news")
 
     def _handle_officials_browse(self) -> None:
-        directory = filedialog.askopenfilename()
-        if len(directory) == 0:
+        files = list(filedialog.askopenfilenames())
+        if len(files) == 0:
             return
+        directory = files[0]
+        self._officials_files = files
         self._config.set_str("officials_list", directory)
         self._officials_list.set(directory)
-        self._officials_list_filename.set(os.path.basename(directory))
+        if len(files) > 1:
+            self._officials_list_filename.set("%s (and %d more)" % (os.path.basename(directory), len(files) - 1))
+        else:
+            self._officials_list_filename.set(os.path.basename(directory))
 
     def _handle_report_dir_browse(self) -> None:
         directory = filedialog.askdirectory()
@@ -198,52 +310,59 @@ class _Generate_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancest
         self.load_btn.configure(state = newstate)
         self.reset_btn.configure(state = newstate)
         self.reports_btn.configure(state = newstate)
+        self.send_btn.configure(state = newstate)
 
     def _handle_reports_btn(self) -> None:
-        if self.df.empty:
+        if self.df is None:
             logging.info ("Load data first...")
             return
         self.buttons("disabled")
-        reports_thread = Generate_Reports(self.df, self._config)
+        reports_thread = _core().Generate_Reports(self.df, self._config)
         reports_thread.start()
-        self.monitor_reports_thread(reports_thread)
+        self.job_status.watch([reports_thread], self._reports_done)
 
 
+    def _handle_send_btn(self) -> None:
+        if self.df is None:
+            logging.info ("Load data first...")
+            return
+        self.buttons("disabled")
+        # Documents waiting to be emailed - enough to keep every SMTP connection busy
+        outbox : Queue = Queue(maxsize=max(1, self._config.get_int("email_connections")) * 2)
+        reports_thread = _core().Generate_Reports(self.df, self._config, outbox=outbox)
+        email_thread = _core().Email_Reports(False, self._config, outbox=outbox)
+        reports_thread.start()
+        email_thread.start()
+        self.job_status.watch([reports_thread, email_thread], self._reports_done)
+
     def _handle_load_btn(self) -> None:
         self.buttons("disabled")
-        load_thread = Data_Loader(self._config)
+        load_thread = _core().Data_Loader(self._config, self._officials_files)
         load_thread.start()
-        self.monitor_load_thread(load_thread)
+        self.job_status.watch([load_thread], self._load_done)
 
     def _handle_reset_btn(self) -> None:
         self.buttons("disabled")
-        self.df = pd.DataFrame()
+        self.df = None
         logging.info("Reset Complete")
         self.buttons("enabled")
 
 
-    def monitor_load_thread(self, thread):
-        if thread.is_alive():
-            # check the thread every 100ms 
-            self.after(100, lambda: self.monitor_load_thread(thread))
-        else:
-            # Retrieve data from the loading process and merge it with already loaded data
-            if self.df.empty:
-                self.df = thread.df
+    def _load_done(self, done: JobDone) -> None:
+        # Merge the data from the loading process with already loaded data
+        df = done.result
+        if df is not None and not done.cancelled and not df.empty:
+            if self.df is None:
+                self.df = df
             else:
-                self.df = pd.concat([self.df,thread.df], axis=0).drop_duplicates()
+                # The latest load wins for officials that were already loaded
+                self.df = _core().merge_rtr_exports([self.df, df])
                 logging.info("%d officials records merged" % self.df.shape[0])
- 
-            self.buttons("enabled")
-            thread.join()
 
-    def monitor_reports_thread(self, thread):
-        if thread.is_alive():
-            # check the thread every 100ms 
-            self.after(100, lambda: self.monitor_reports_thread(thread))
-        else:
-            self.buttons("enabled")
-            thread.join()
+        self.buttons("enabled")
+
+    def _reports_done(self, done: JobDone) -> None:
+        self.buttons("enabled")
 
 class _Email_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancestors
     '''E-Mail Completed list of Word Documents'''
@@ -335,6 +454,8 @@ class _Email_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancestors
         self.emailtest_btn.grid(column=0, row=1, sticky="news", padx=20, pady=10)
         self.emailall_btn = ctk.CTkButton(buttonsframe, text="Send All Emails", command=self._handle_email_all_btn)
         self.emailall_btn.grid(column=1, row=1, sticky="news", padx=20, pady=10)
+        self.job_status = _Job_Status(buttonsframe)
+        self.job_status.grid(column=0, row=2, columnspan=2, sticky="news")
 
 
     def _handle_report_dir_browse(self) -> None:
@@ -360,6 +481,7 @@ class _Email_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancestors
 
     def _handle_email_smtp_password(self, event) -> bool:
         if event.widget.get() != "Password":
+            import keyring   # pylint: disable=import-outside-toplevel
             keyring.set_password("SWON-DOCGEN", self._email_smtp_user.get(), event.widget.get())
             logging.info("Password Changed for %s" % self._email_smtp_user.get())
         return True
@@ -383,23 +505,18 @@ class _Email_Documents_Tab(ctk.CTkFrame):   # pylint: disable=too-many-ancestors
 
     def _handle_email_test_btn(self) -> None:
         self.buttons("disabled")
-        email_thread = Email_Reports(True, self._config)
+        email_thread = _core().Email_Reports(True, self._config)
         email_thread.start()
-        self.monitor_email_thread(email_thread)
+        self.job_status.watch([email_thread], self._email_done)
 
     def _handle_email_all_btn(self) -> None:
         self.buttons("disabled")
-        email_thread = Email_Reports(False, self._config)
+        email_thread = _core().Email_Reports(False, self._config)
         email_thread.start()
-        self.monitor_email_thread(email_thread)
+        self.job_status.watch([email_thread], self._email_done)
 
-    def monitor_email_thread(self, thread):
-        if thread.is_alive():
-            # check the thread every 100ms 
-            self.after(100, lambda: self.monitor_email_thread(thread))
-        else:
-            self.buttons("enabled")
-            thread.join()
+    def _email_done(self, done: JobDone) -> None:
+        self.buttons("enabled")
 
 
 class _Logging(ctk.CTkFrame): # pylint: disable=too-many-ancestors,too-many-instance-attributes
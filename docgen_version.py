@@ -21,6 +21,7 @@
 
 """Version information"""
 import datetime
+import json
 import re
 from typing import List, Optional
 
@@ -42,8 +43,12 @@ class ReleaseInfo:
     prerelease: bool  # Whether the release is a prerelease
     published: datetime.datetime  # When the release was published
     semver: str  # The version corresponding to the tag
+    release_json: dict  # The fields above as returned by GitHub, used to cache the release
+
+    _FIELDS = ["tag_name", "html_url", "draft", "prerelease", "published_at"]
 
     def __init__(self, release_json):
+        self.release_json = {field: release_json[field] for field in self._FIELDS}
         self.tag = release_json["tag_name"]
         self.url = release_json["html_url"]
         self.draft = release_json["draft"]
@@ -55,19 +60,22 @@ class ReleaseInfo:
             self.semver = match.group(1)
 
 
-def releases(user_repo: str) -> List[ReleaseInfo]:
+GITHUB_API = "https://api.github.com"
+
+
+def releases(user_repo: str, api_url: str = GITHUB_API) -> List[ReleaseInfo]:
     """
     Retrieves the list of releases for the provided repo. user_repo should be
-    of the form "user/repo" (i.e., "JohnStrunk/wahoo-results")
+    of the form "user/repo" (i.e., "JohnStrunk/wahoo-results"). Raises
+    requests.HTTPError if GitHub doesn't return the list (e.g., rate limited).
     """
-    url = f"https://api.github.com/repos/{user_repo}/releases"
-    # The timeout may be too fast, but it's going to hold up displaying the
-    # settings screen. Better to miss an update than hang for too long.
+    url = f"{api_url}/repos/{user_repo}/releases"
+    # The check runs in the background, but better to miss an update than
+    # keep a connection open for too long.
     resp = requests.get(
-        url, headers={"Accept": "application/vnd.github.v3+json"}, timeout=2
+        url, headers={"Accept": "application/vnd.github.v3+json"}, timeout=10
     )
-    if not resp.ok:
-        return []
+    resp.raise_for_status()
 
     body = resp.json()
     return list(map(ReleaseInfo, body))
@@ -135,14 +143,96 @@ def git_semver(wrv: str) -> str:
     return str(version_info)
 
 
-def latest() -> Optional[ReleaseInfo]:
+def latest(api_url: str = GITHUB_API) -> Optional[ReleaseInfo]:
     """Retrieves the latest release info"""
-    rlist = releases("dmanusrex/docgen")
+    rlist = releases("dmanusrex/docgen", api_url)
     if len(rlist) == 0:
         return None
     return highest_semver(rlist)
 
 
+def latest_cached(
+    cache_file: str,
+    max_age: datetime.timedelta = datetime.timedelta(days=1),
+    api_url: str = GITHUB_API,
+) -> Optional[ReleaseInfo]:
+    """
+    Retrieves the latest release info, asking GitHub at most once per max_age.
+    The answer is kept in cache_file along with when it was retrieved. A
+    failed request raises and isn't cached, so it is retried on the next call.
+
+    A fresh answer is used without a request (nothing listens on port 9):
+    >>> import os, tempfile
+    >>> cache_file = os.path.join(tempfile.mkdtemp(), "update.json")
+    >>> rdict = {"tag_name": "v1.2.0",
+    ...          "html_url": "",
+    ...          "draft": False,
+    ...          "prerelease": False,
+    ...          "published_at": "2020-01-01 00:00:00"}
+    >>> now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    >>> with open(cache_file, "w", encoding="utf-8") as cache:
+    ...     json.dump({"checked": now, "release": rdict}, cache)
+    >>> latest_cached(cache_file, api_url="http://127.0.0.1:9").semver
+    '1.2.0'
+
+    Otherwise GitHub (here a local stub counting its requests) is asked once:
+    >>> import http.server, threading
+    >>> class Stub(http.server.BaseHTTPRequestHandler):
+    ...     status, requests = 200, 0
+    ...     def do_GET(self):
+    ...         Stub.requests += 1
+    ...         self.send_response(Stub.status)
+    ...         self.end_headers()
+    ...         self.wfile.write(json.dumps([rdict | {"tag_name": "v2.0.0"}]).encode())
+    ...     def log_message(self, *args):
+    ...         pass
+    >>> server = http.server.HTTPServer(("127.0.0.1", 0), Stub)
+    >>> threading.Thread(target=server.serve_forever, daemon=True).start()
+    >>> stub_url = f"http://127.0.0.1:{server.server_port}"
+    >>> os.remove(cache_file)
+    >>> latest_cached(cache_file, api_url=stub_url).semver
+    '2.0.0'
+    >>> latest_cached(cache_file, api_url=stub_url).semver, Stub.requests
+    ('2.0.0', 1)
+
+    A failed request (e.g., rate limited) isn't cached:
+    >>> Stub.status = 403
+    >>> os.remove(cache_file)
+    >>> try:
+    ...     latest_cached(cache_file, api_url=stub_url)
+    ... except requests.HTTPError as error:
+    ...     error.response.status_code
+    403
+    >>> os.path.exists(cache_file)
+    False
+    >>> server.shutdown()
+    """
+    now = datetime.datetime.now(datetime.timezone.utc)
+    try:
+        with open(cache_file, "r", encoding="utf-8") as cache:
+            cached = json.load(cache)
+        if now - datetime.datetime.fromisoformat(cached["checked"]) < max_age:
+            if cached["release"] is None:
+                return None
+            return ReleaseInfo(cached["release"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+
+    release = latest(api_url)
+    try:
+        with open(cache_file, "w", encoding="utf-8") as cache:
+            json.dump(
+                {
+                    "checked": now.isoformat(),
+                    "release": None if release is None else release.release_json,
+                },
+                cache,
+            )
+    except OSError:
+        pass
+    return release
+
+
 def is_latest_version(latest_version: Optional[ReleaseInfo], swonv: str) -> bool:
     """
     Returns true if the running version is the most recent